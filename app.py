@@ -1,24 +1,38 @@
 import os
-import tempfile
-from typing import List, Dict, Any, Tuple
+import hashlib
+import logging
+import pickle
+import threading
+from bisect import bisect_right
+from typing import List, Dict, Any, Tuple, Generator
 import streamlit as st
-import pdfplumber
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from streamlit.runtime.scriptrunner import add_script_run_ctx
+from semantic_text_splitter import TextSplitter
 import hmac
+import numpy as np
 
 from config import (
     CHUNK_SIZE,
     CHUNK_OVERLAP,
+    EMBEDDING_MODEL_NAME,
     LLM_MODELS,
     DEFAULT_LLM_MODEL,
     GROQ_API_KEY,
+    INGEST_CACHE_DIR,
+    INGEST_CACHE_VERSION,
+    INGEST_EMBED_BATCH_SIZE,
+    LOG_LEVEL,
+    VECTOR_DATATYPE,
     UI_TEXTS
 )
 from embeddings import get_embedder
 from vector_store import get_vector_store
 from retrieval import get_retrieval_engine
-from llm_generator import get_llm_generator
+from llm_generator import get_llm_generator, LLM_ERROR_MESSAGE
+from response_cache import get_response_cache
+from pdf_extractor import iter_extract_pdfs
 
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 
 # Sayfa düzeni
 st.set_page_config(
@@ -28,6 +42,15 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+def warmup_embedder():
+    # Load the model and run one forward pass so the first ingest does not pay for it
+    try:
+        get_embedder().embed_query("warmup")
+        st.session_state.embedder_loaded = True
+    except Exception as e:
+        print(f"Embedder warmup error: {e}")
+
+
 def init_session_state():
     if "documents_processed" not in st.session_state:
         st.session_state.documents_processed = False
@@ -39,6 +62,11 @@ def init_session_state():
         st.session_state.embedder_loaded = False
     if "sources" not in st.session_state:
         st.session_state.sources = []  
+    if "embedder_warmup_started" not in st.session_state:
+        st.session_state.embedder_warmup_started = True
+        warmup_thread = threading.Thread(target=warmup_embedder, daemon=True)
+        add_script_run_ctx(warmup_thread)
+        warmup_thread.start()
 
 def check_password():
     """Returns `True` if the user had a correct password."""
@@ -68,95 +96,201 @@ def check_password():
 init_session_state()
 
 
-def extract_text_from_pdf(pdf_file) -> List[Dict[str, Any]]:
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        tmp.write(pdf_file.getvalue())
-        tmp_path = tmp.name
-    
-    pages_data = []
-    try:
-        with pdfplumber.open(tmp_path) as pdf:
-            for page_num, page in enumerate(pdf.pages, 1):
-                text = page.extract_text(layout=True)
-                if text and text.strip():
-                    pages_data.append({
-                        "text": text,
-                        "page_number": page_num
-                    })
-    except Exception as e:
-        st.error(f"PDF okuma hatası: {e}")
-    finally:
-        os.unlink(tmp_path)
-    
-    return pages_data
+_SPLITTER = TextSplitter(capacity=CHUNK_SIZE, overlap=CHUNK_OVERLAP)
 
 
-def chunk_text(text: str, source: str, page_number: int) -> List[Dict[str, Any]]:
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
-        length_function=len,
-        separators=["\n\n", "\n", ".", " ", ""]
-    )
+def chunk_id(source: str, page_number: int, chunk_index: int, text: str) -> int:
+    # Deterministic 64-bit point ID so re-ingesting a file overwrites its points
+    digest = hashlib.blake2b(
+        f"{source}\0{page_number}\0{chunk_index}\0{text[:64]}".encode("utf-8"),
+        digest_size=8
+    ).hexdigest()
+    return int(digest, 16)
+
+
+def chunk_document(pages_data: List[Dict[str, Any]], source: str) -> List[Dict[str, Any]]:
+    # Chunk the whole document at once so chunks can span page breaks,
+    # then map each chunk back to the page it starts on
+    page_separator = "\n\n"
+    # A page's range starts at the separator before it, so a chunk starting
+    # inside a separator belongs to the page whose text follows
+    offsets = []
+    position = 0
+    for page_data in pages_data:
+        offsets.append(max(position - len(page_separator), 0))
+        position += len(page_data["text"]) + len(page_separator)
     
-    chunks = splitter.split_text(text)
+    full_text = page_separator.join(page_data["text"] for page_data in pages_data)
+    # chunk_indices returns character offsets, so no need to search for each chunk
+    chunks = _SPLITTER.chunk_indices(full_text)
     
-    return [
-        {
+    results = []
+    for i, (start, chunk) in enumerate(chunks):
+        page_idx = max(bisect_right(offsets, start) - 1, 0)
+        page_number = pages_data[page_idx]["page_number"]
+        results.append({
+            "id": chunk_id(source, page_number, i, chunk),
             "text": chunk,
             "source": source,
             "chunk_index": i,
             "page_number": page_number
-        }
-        for i, chunk in enumerate(chunks)
-    ]
+        })
+    
+    return results
+
+
+def ingest_cache_key(file_bytes: bytes) -> str:
+    # Cached chunks and vectors are only valid for the pipeline that produced them,
+    # so the settings that shape them are hashed together with the file
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(
+        f"{INGEST_CACHE_VERSION}\0{EMBEDDING_MODEL_NAME}\0{VECTOR_DATATYPE}\0"
+        f"{CHUNK_SIZE}\0{CHUNK_OVERLAP}\0".encode("utf-8")
+    )
+    digest.update(file_bytes)
+    return digest.hexdigest()
+
+
+def _ingest_cache_path(file_hash: str) -> str:
+    return os.path.join(INGEST_CACHE_DIR, f"{file_hash}.pkl")
+
+
+def load_ingest_cache(file_hash: str):
+    path = _ingest_cache_path(file_hash)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            texts, metadatas, embeddings = pickle.load(f)
+    except Exception as e:
+        print(f"Ingest cache read error: {e}")
+        return None
+    
+    return texts, metadatas, embeddings.astype(np.float32)
+
+
+def save_ingest_cache(file_hash: str, texts: List[str], metadatas: List[Dict[str, Any]], embeddings) -> None:
+    try:
+        os.makedirs(INGEST_CACHE_DIR, exist_ok=True)
+        with open(_ingest_cache_path(file_hash), "wb") as f:
+            # Same precision Qdrant stores (float16 by default), so a re-upload from the cache
+            # writes exactly what a fresh upload would
+            embeddings = np.asarray(embeddings, dtype=VECTOR_DATATYPE)
+            pickle.dump((texts, metadatas, embeddings), f, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        print(f"Ingest cache write error: {e}")
 
 
 def process_uploaded_files(uploaded_files) -> int:
     vector_store = get_vector_store()
+    embedder = get_embedder()
     
     total_chunks = 0
     
     progress_bar = st.progress(0)
     status_text = st.empty()
     
-    for i, pdf_file in enumerate(uploaded_files):
-        status_text.text(f"İşleniyor: {pdf_file.name}")
+    def upsert(texts, embeddings, metadatas, ids) -> int:
+        try:
+            vector_store.add_with_embeddings(texts, embeddings, metadatas, ids=ids)
+            return len(texts)
+        except Exception as e:
+            st.error(f"Dökümanlar eklenirken hata: {e}")
+            return 0
+    
+    # Files seen before (same bytes and ingest settings) reuse their chunks and embeddings
+    pending_files = []
+    for pdf_file in uploaded_files:
+        file_bytes = pdf_file.getvalue()
+        file_hash = ingest_cache_key(file_bytes)
+        cached = load_ingest_cache(file_hash)
         
+        if cached is None:
+            pending_files.append((pdf_file, file_hash, file_bytes))
+            continue
+        
+        texts, metadatas, embeddings = cached
+        metadatas = [{**meta, "source": pdf_file.name} for meta in metadatas]
+        ids = [
+            chunk_id(meta["source"], meta["page_number"], meta["chunk_index"], text)
+            for text, meta in zip(texts, metadatas)
+        ]
+        total_chunks += upsert(texts, embeddings, metadatas, ids)
+    
+    # Chunks waiting to be embedded, flushed in large batches
+    pending_chunks = []
+    
+    def flush() -> int:
+        texts = [chunk["text"] for _, chunks in pending_chunks for chunk in chunks]
+        if not texts:
+            return 0
+        
+        status_text.text(f"Vektörleştiriliyor: {len(texts)} metin parçası")
         try:
-            pages_data = extract_text_from_pdf(pdf_file)
+            embeddings = embedder.embed_passages(texts)
+        except Exception as e:
+            st.error(f"Vektörleştirme hatası: {e}")
+            pending_chunks.clear()
+            return 0
+        
+        metadatas = []
+        offset = 0
+        for file_hash, chunks in pending_chunks:
+            file_metadatas = [
+                {
+                    "source": chunk["source"],
+                    "chunk_index": chunk["chunk_index"],
+                    "page_number": chunk["page_number"]
+                }
+                for chunk in chunks
+            ]
+            save_ingest_cache(
+                file_hash,
+                [chunk["text"] for chunk in chunks],
+                file_metadatas,
+                embeddings[offset:offset + len(chunks)]
+            )
+            metadatas.extend(file_metadatas)
+            offset += len(chunks)
+        
+        ids = [chunk["id"] for _, chunks in pending_chunks for chunk in chunks]
+        pending_chunks.clear()
+        return upsert(texts, embeddings, metadatas, ids)
+    
+    if pending_files:
+        status_text.text(f"PDF metinleri çıkarılıyor: {len(pending_files)} dosya")
+        # Raw bytes go to the extractor; Streamlit upload objects are not picklable.
+        # Files arrive as soon as they are extracted, so embedding overlaps with
+        # worker processes still extracting the remaining files.
+        extraction_stream = iter_extract_pdfs(
+            [file_bytes for _, _, file_bytes in pending_files],
+            progress_callback=lambda done, total: progress_bar.progress(done / total)
+        )
+        
+        for file_idx, extraction in extraction_stream:
+            pdf_file, file_hash, _ = pending_files[file_idx]
+            status_text.text(f"İşleniyor: {pdf_file.name}")
+            
+            if extraction["error"]:
+                st.error(f"PDF okuma hatası ({pdf_file.name}): {extraction['error']}")
+            
+            pages_data = extraction["pages"]
             
             if not pages_data:
                 st.warning(f"{pdf_file.name} dosyasından metin çıkarılamadı.")
                 continue
             
-            all_texts = []
-            all_metadatas = []
-            
-            for page_data in pages_data:
-                chunks = chunk_text(
-                    page_data["text"], 
-                    pdf_file.name, 
-                    page_data["page_number"]
-                )
-                
-                for chunk in chunks:
-                    all_texts.append(chunk["text"])
-                    all_metadatas.append({
-                        "source": chunk["source"],
-                        "chunk_index": chunk["chunk_index"],
-                        "page_number": chunk["page_number"]
-                    })
+            try:
+                chunks = chunk_document(pages_data, pdf_file.name)
+            except Exception as e:
+                st.error(f"{pdf_file.name} işlenirken hata: {e}")
+                continue
             
-            if all_texts:
-                vector_store.add_documents(all_texts, all_metadatas)
-                total_chunks += len(all_texts)
-                
-        except Exception as e:
-            st.error(f"{pdf_file.name} işlenirken hata: {e}")
-            continue
+            pending_chunks.append((file_hash, chunks))
+            if sum(len(c) for _, c in pending_chunks) >= INGEST_EMBED_BATCH_SIZE:
+                total_chunks += flush()
         
-        progress_bar.progress((i + 1) / len(uploaded_files))
+        total_chunks += flush()
     
     progress_bar.empty()
     status_text.empty()
@@ -215,6 +349,9 @@ def render_sidebar():
         if st.sidebar.button(UI_TEXTS["process_button"], type="primary", use_container_width=True):
             with st.spinner(UI_TEXTS["processing"]):
                 chunk_count = process_uploaded_files(uploaded_files)
+                # New documents can change answers, so cached ones are dropped
+                get_retrieval_engine().clear_cache()
+                get_response_cache().clear()
                 st.session_state.documents_processed = True
                 st.session_state.chunk_count = chunk_count
                 st.sidebar.success(UI_TEXTS["processing_complete"].format(count=len(uploaded_files)))
@@ -229,6 +366,8 @@ def render_sidebar():
         if st.sidebar.button("Veritabanını Sıfırla", use_container_width=True):
             try:
                 get_vector_store().clear_collection()
+                get_retrieval_engine().clear_cache()
+                get_response_cache().clear()
                 st.session_state.documents_processed = False
                 st.session_state.chunk_count = 0
                 st.session_state.chat_history = []
@@ -292,9 +431,9 @@ def render_chat():
         
         with st.chat_message("assistant"):
             with st.spinner(UI_TEXTS["thinking"]):
-                response, sources, debug_info = generate_response(prompt)
+                response_stream, sources, debug_info = generate_response(prompt)
             
-            st.markdown(response)
+            response = st.write_stream(response_stream)
             
             with st.expander(f"{UI_TEXTS['sources_label']} ({len(sources)} kaynak)"):
                 for src in sources:
@@ -323,39 +462,100 @@ def render_chat():
         })
 
 
-def generate_response(query: str) -> Tuple[str, List[Dict], Dict]:
+def stream_with_fallback(llm, **generate_kwargs) -> Generator[str, None, None]:
+    started = False
     try:
+        for token in llm.generate_stream(**generate_kwargs):
+            if not started and token == LLM_ERROR_MESSAGE:
+                # generate_stream reports a failed request as its only token instead of raising
+                yield llm.generate(**generate_kwargs)
+                return
+            started = True
+            yield token
+    except Exception as e:
+        print(f"Stream error: {e}")
+        if not started:
+            yield llm.generate(**generate_kwargs)
+        else:
+            # Same marker generate_stream appends when it fails after streaming tokens
+            yield LLM_ERROR_MESSAGE
+
+
+def cache_on_completion(
+    response_stream: Generator[str, None, None],
+    query_embedding: List[float],
+    sources: List[Dict],
+    scope: Tuple
+) -> Generator[str, None, None]:
+    tokens = []
+    failed = False
+    for token in response_stream:
+        # A failure can arrive after partial output, so the joined answer is not enough to detect it
+        failed = failed or token == LLM_ERROR_MESSAGE
+        tokens.append(token)
+        yield token
+    
+    answer = "".join(tokens)
+    if answer and not failed:
+        get_response_cache().add(query_embedding, answer, sources, scope=scope)
+
+
+def generate_response(query: str) -> Tuple[Generator[str, None, None], List[Dict], Dict]:
+    try:
+        use_reranking = st.session_state.get("use_reranking", True)
+        model_id = st.session_state.get("selected_model", DEFAULT_LLM_MODEL)
+        cache_scope = (model_id, use_reranking)
+        
+        # Follow-up questions depend on the conversation, so only a standalone
+        # question (the one just appended to the history) goes through the cache
+        query_embedding = None
+        if len(st.session_state.chat_history) <= 1:
+            query_embedding = get_embedder().embed_query(query)
+            cached = get_response_cache().lookup(query_embedding, scope=cache_scope)
+            if cached is not None:
+                answer, sources = cached
+                return iter([answer]), sources, {
+                    "query": query,
+                    "use_reranking": use_reranking,
+                    "stage1_count": 0,
+                    "final_method": "response_cache"
+                }
+        
         retrieval_engine = get_retrieval_engine()
         results, debug_info = retrieval_engine.retrieve(
             query=query,
-            use_reranking=st.session_state.get("use_reranking", True)
+            use_reranking=use_reranking
         )
         
         context = retrieval_engine.build_context(results)
         sources = retrieval_engine.format_sources(results)
         
         chat_history = []
-        for msg in st.session_state.chat_history[-6:]:
+        for msg in st.session_state.chat_history:
             chat_history.append({
                 "role": msg["role"],
                 "content": msg["content"]
             })
         
         llm = get_llm_generator()
-        response = llm.generate(
+        response_stream = stream_with_fallback(
+            llm,
             question=query,
             context=context,
             chat_history=chat_history,
-            model_id=st.session_state.get("selected_model", DEFAULT_LLM_MODEL)
+            model_id=model_id
         )
         
-        return response, sources, debug_info
+        if query_embedding is not None:
+            response_stream = cache_on_completion(response_stream, query_embedding, sources, cache_scope)
+        
+        return response_stream, sources, debug_info
         
     except Exception as e:
         error_msg = "Bağlantı hatası, lütfen tekrar deneyin."
         st.error(f"{error_msg}")
         print(f"Generate response error: {e}")
-        return error_msg, [], {"error": str(e)}
+        return iter([error_msg]), [], {"error": str(e)}
 
 
 def main():
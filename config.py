@@ -6,9 +6,17 @@ load_dotenv()
 # Embedding model
 EMBEDDING_MODEL_NAME = "intfloat/multilingual-e5-small"
 EMBEDDING_DIMENSION = 384  # multilingual-e5-small output dimension
-
-# Model used for reranking strategy
+EMBEDDING_BATCH_SIZE_CPU = 64  # Mini-batch size for encode() on CPU
+EMBEDDING_BATCH_SIZE_GPU = 128  # Mini-batch size for encode() on CUDA
+EMBEDDING_SORT_GROUP_SIZE = 10_000  # Texts sorted by token length per group before batching
+EMBEDDING_HALF_PRECISION = True  # Run the embedding model in FP16 on CUDA
+EMBEDDING_CACHE_DIR = "./emb_cache"  # On-disk passage embedding cache, empty string disables
+
+# Model used for reranking strategy. FlashRank ships this one as a dynamically
+# quantized INT8 ONNX file (flashrank-MiniLM-L-12-v2_Q.onnx); keep a _Q variant
+# so the cross-encoder matmuls run as int8 GEMMs on CPU
 RERANKER_MODEL_NAME = "ms-marco-MiniLM-L-12-v2"
+RERANKER_TRUNCATE_LAYER = None  # Keep only the first N of the reranker's 12 encoder layers, None keeps all
 
 # LLM Models
 LLM_MODELS = {
@@ -20,6 +28,14 @@ LLM_MODELS = {
 DEFAULT_LLM_MODEL = "llama-3.3-70b-versatile"
 
 
+# PDF extraction settings
+PDF_EXTRACTION_WORKERS = os.cpu_count() or 1  # Worker processes for PDF text extraction
+PDF_PAGES_PER_SHARD = 25  # Pages extracted per worker task
+INGEST_CACHE_DIR = "./cache/ingest"  # Chunks + embeddings per uploaded file hash
+INGEST_CACHE_VERSION = 3  # Bump when extraction, chunking or the cache format changes
+INGEST_EMBED_BATCH_SIZE = 512  # Chunks accumulated before an embed + upsert flush
+
+
 # Document chunk size and overlap settings
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200  
@@ -27,15 +43,48 @@ CHUNK_OVERLAP = 200
 # Search parameters
 TOP_K_INITIAL = 25  # Return top 25 most relevant chunks in first stage
 TOP_K_RERANKED = 5  # Select top 5 chunks after reranking
+SKIP_RERANK_MARGIN = 0.2  # Skip reranking when the top vector score leads the top_k_final-th by more than this
+
+# Candidates passed to the reranker per recall mode; reranker latency grows linearly with K.
+# Re-run tests/calibrate_top_k.py against a held-out QA set after changing documents or models.
+RECALL_MODE_TOP_K = {
+    "fast": 10,
+    "balanced": TOP_K_INITIAL,
+    "high_recall": 50
+}
+
+# Micro-batching for queued retrievals (RetrievalEngine.submit)
+RETRIEVAL_BATCH_WINDOW_MS = 10  # How long the worker waits to fill a batch after the first query
+RETRIEVAL_MAX_BATCH_SIZE = 16  # Queries handled per retrieve_batch call
+MAX_RETRIEVAL_CONCURRENCY = 4  # Worker threads for RetrievalEngine.retrieve_async
+RETRIEVAL_CACHE_SIZE = 256  # LRU entries of retrieve() results, 0 disables
+
+# Approximate token budget for chat history included in the prompt
+CHAT_HISTORY_TOKEN_BUDGET = 1024
+
+# Semantic response cache: reuse an answer when a new question is this similar to a cached one
+RESPONSE_CACHE_THRESHOLD = 0.97  # Minimum cosine similarity between query embeddings
+RESPONSE_CACHE_MAX_ENTRIES = 256  # Oldest answers are evicted beyond this
 
 # Qdrant settings
 QDRANT_PATH = "./qdrant_db"  # Qdrant data path
 COLLECTION_NAME = "documents_tr"
 USE_MEMORY_MODE = False
+VECTOR_DATATYPE = "float16"  # Stored vector precision: float32 | float16
+VECTOR_INT8_QUANTIZATION = True  # Keep an INT8 scalar-quantized copy in RAM for search
+VECTOR_QUANTIZATION_OVERSAMPLING = 2.0  # INT8 candidates fetched per result, rescored with the stored vectors
+HNSW_EF_MIN = 64  # Search uses hnsw_ef = max(HNSW_EF_MIN, 2 * top_k)
+QUERY_CACHE_MAX_SIZE = 2000  # LRU entries of VectorStore search results, 0 disables
+QUERY_CACHE_TTL = 300  # Seconds a cached search result stays valid
+QDRANT_UPLOAD_BATCH_SIZE = 256  # Points per upload_points request
+QDRANT_UPLOAD_PARALLEL = 4  # Parallel upload workers against a Qdrant server (ignored in local mode)
 
 # API Key
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 
+# Level for modules that log through the logging module (DEBUG, INFO, WARNING, ...)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+
 
 # Prompt to be used in the model
 SYSTEM_PROMPT_TR = """Sen deneyimli bir Kıdemli ERP Yazılım ve Finans Danışmanısın. Türk işletme finansmanı, ERP sistemleri, vergi mevzuatı ve muhasebe konularında uzmansın.
@@ -1,42 +1,135 @@
+import hashlib
+import threading
 import torch
 from sentence_transformers import SentenceTransformer
-from typing import List
+from diskcache import Cache
+from typing import List, Optional
 from langchain_core.embeddings import Embeddings
 import numpy as np
 
-from config import EMBEDDING_MODEL_NAME
+from config import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_BATCH_SIZE_CPU,
+    EMBEDDING_BATCH_SIZE_GPU,
+    EMBEDDING_SORT_GROUP_SIZE,
+    EMBEDDING_HALF_PRECISION,
+    EMBEDDING_CACHE_DIR
+)
 
 
 class TurkishEmbedder(Embeddings):
-    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME, cache_dir: Optional[str] = None):
         self.model_name = model_name
+        self.cache_dir = EMBEDDING_CACHE_DIR if cache_dir is None else cache_dir
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.batch_size = EMBEDDING_BATCH_SIZE_GPU if self.device == "cuda" else EMBEDDING_BATCH_SIZE_CPU
         print(f"Loading embedding model: {model_name}")
         print(f"Device: {self.device}")
         
         self._model = None
+        self._model_lock = threading.Lock()
+        self._cache = None
+        self._passage_key_hasher = hashlib.blake2b(
+            f"{model_name}\0passage: ".encode("utf-8"),
+            digest_size=16
+        )
     
     @property
     def model(self) -> SentenceTransformer:
+        # Double-checked so the warmup thread and a first ingest or query cannot load it twice
         if self._model is None:
-            self._model = SentenceTransformer(self.model_name, device=self.device)
-            print("Embedding model ready!")
+            with self._model_lock:
+                if self._model is None:
+                    model = SentenceTransformer(self.model_name, device=self.device)
+                    if self.device == "cuda" and EMBEDDING_HALF_PRECISION:
+                        model.half()
+                    self._model = model
+                    print("Embedding model ready!")
         return self._model
     
+    @property
+    def cache(self) -> Optional[Cache]:
+        if self._cache is None and self.cache_dir:
+            self._cache = Cache(self.cache_dir)
+        return self._cache
+    
+    def _cache_key(self, text: str) -> str:
+        # Model name is part of the key so switching models never returns stale vectors.
+        # Hashing prefix and text separately avoids building the prefixed string.
+        hasher = self._passage_key_hasher.copy()
+        hasher.update(text.encode("utf-8"))
+        return hasher.hexdigest()
+    
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         if not texts:
             return []
         
-        prefixed_texts = [f"passage: {text}" for text in texts]
+        # LangChain expects plain lists; convert only at this boundary
+        return self._embed_passages_array(texts).tolist()
+    
+    def _embed_passages_array(self, texts: List[str]) -> np.ndarray:
+        cache = self.cache
+        if cache is None:
+            return self._encode_passages(texts)
         
-        embeddings = self.model.encode(
-            prefixed_texts,
-            convert_to_numpy=True,
-            show_progress_bar=len(texts) > 10,
-            normalize_embeddings=True
-        )
+        keys = [self._cache_key(text) for text in texts]
+        embeddings = [cache.get(key) for key in keys]
+        miss_idx = [i for i, emb in enumerate(embeddings) if emb is None]
         
-        return embeddings.tolist()
+        if miss_idx:
+            new_embeddings = self._encode_passages([texts[i] for i in miss_idx])
+            for i, emb in zip(miss_idx, new_embeddings):
+                cache.set(keys[i], emb)
+                embeddings[i] = emb
+        
+        return np.vstack(embeddings)
+    
+    def _encode_passages(self, texts: List[str]) -> np.ndarray:
+        if len(texts) <= self.batch_size:
+            return self.model.encode(
+                [f"passage: {text}" for text in texts],
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=len(texts) > 10,
+                normalize_embeddings=True
+            )
+        return self._encode_length_bucketed(texts)
+    
+    def _encode_length_bucketed(self, texts: List[str]) -> np.ndarray:
+        # Sort by token length so each batch is padded to a similar length,
+        # then scatter the embeddings back into the original order. The prefix
+        # adds the same token count to every text, so raw lengths sort identically
+        # and prefixed strings are only built one batch at a time.
+        embeddings = None
+        
+        for group_start in range(0, len(texts), EMBEDDING_SORT_GROUP_SIZE):
+            group = texts[group_start:group_start + EMBEDDING_SORT_GROUP_SIZE]
+            lengths = self.model.tokenizer(
+                group,
+                truncation=True,
+                max_length=self.model.max_seq_length,
+                return_length=True
+            )["length"]
+            order = np.argsort(lengths, kind="stable")
+            
+            for start in range(0, len(group), self.batch_size):
+                batch_idx = order[start:start + self.batch_size]
+                batch_embeddings = self.model.encode(
+                    [f"passage: {group[j]}" for j in batch_idx],
+                    batch_size=self.batch_size,
+                    convert_to_numpy=True,
+                    show_progress_bar=False,
+                    normalize_embeddings=True
+                )
+                
+                if embeddings is None:
+                    embeddings = np.empty(
+                        (len(texts), batch_embeddings.shape[1]),
+                        dtype=batch_embeddings.dtype
+                    )
+                embeddings[group_start + batch_idx] = batch_embeddings
+        
+        return embeddings
     
     def embed_query(self, text: str) -> List[float]:
         prefixed_query = f"query: {text}"
@@ -49,8 +142,21 @@ class TurkishEmbedder(Embeddings):
         
         return embedding.tolist()
     
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        # One encode call for the whole batch
+        embeddings = self.model.encode(
+            [f"query: {text}" for text in texts],
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+        return embeddings.tolist()
+    
     def embed_passages(self, texts: List[str]) -> np.ndarray:
-        return np.array(self.embed_documents(texts))
+        if not texts:
+            return np.array([])
+        return self._embed_passages_array(texts)
     
     @property
     def embedding_dimension(self) -> int:
@@ -58,12 +164,16 @@ class TurkishEmbedder(Embeddings):
 
 
 _embedder_instance = None
+_embedder_lock = threading.Lock()
 
 
 def get_embedder() -> TurkishEmbedder:
     global _embedder_instance
+    # Double-checked so concurrent first calls cannot build two instances
     if _embedder_instance is None:
-        _embedder_instance = TurkishEmbedder()
+        with _embedder_lock:
+            if _embedder_instance is None:
+                _embedder_instance = TurkishEmbedder()
     return _embedder_instance
 
 
@@ -1,3 +1,5 @@
+import re
+import threading
 from typing import Optional, Generator, List, Dict
 from groq import Groq
 
@@ -5,9 +7,23 @@ from config import (
     GROQ_API_KEY,
     LLM_MODELS,
     DEFAULT_LLM_MODEL,
-    SYSTEM_PROMPT_TR
+    SYSTEM_PROMPT_TR,
+    CHAT_HISTORY_TOKEN_BUDGET
 )
 
+# Returned in place of an answer when the Groq request fails
+LLM_ERROR_MESSAGE = "Connection error, please try again."
+
+# Static prompt fragments with placeholder names at odd indices, split once at import
+_PROMPT_PARTS = re.split(r"\{(chat_history|context|question)\}", SYSTEM_PROMPT_TR)
+
+
+def _render_prompt(**values: str) -> str:
+    parts = list(_PROMPT_PARTS)
+    for i in range(1, len(parts), 2):
+        parts[i] = values[parts[i]]
+    return "".join(parts)
+
 
 class LLMGenerator:
     def __init__(self, api_key: str = GROQ_API_KEY):
@@ -22,13 +38,19 @@ class LLMGenerator:
         if not chat_history:
             return "No conversation history yet."
         
+        # Walk from the newest message back until the token budget is spent,
+        # estimating ~4 characters per token
         formatted_parts = []
-        for msg in chat_history:
+        tokens_used = 0
+        for msg in reversed(chat_history):
             role = "User" if msg["role"] == "user" else "Assistant"
             content = msg["content"][:500]
+            tokens_used += len(content) // 4
+            if formatted_parts and tokens_used > CHAT_HISTORY_TOKEN_BUDGET:
+                break
             formatted_parts.append(f"{role}: {content}")
         
-        return "\n".join(formatted_parts)
+        return "\n".join(reversed(formatted_parts))
     
     def generate(
         self,
@@ -42,7 +64,7 @@ class LLMGenerator:
 
         history_str = self._format_chat_history(chat_history or [])
         
-        formatted_prompt = SYSTEM_PROMPT_TR.format(
+        formatted_prompt = _render_prompt(
             context=context,
             question=question,
             chat_history=history_str
@@ -70,7 +92,7 @@ class LLMGenerator:
         except Exception as e:
             error_msg = f"LLM error: {str(e)}"
             print(f"{error_msg}")
-            return "Connection error, please try again."
+            return LLM_ERROR_MESSAGE
     
     def generate_stream(
         self,
@@ -84,7 +106,7 @@ class LLMGenerator:
         
         history_str = self._format_chat_history(chat_history or [])
         
-        formatted_prompt = SYSTEM_PROMPT_TR.format(
+        formatted_prompt = _render_prompt(
             context=context,
             question=question,
             chat_history=history_str
@@ -114,7 +136,7 @@ class LLMGenerator:
                     
         except Exception as e:
 
-            yield "Connection error, please try again."
+            yield LLM_ERROR_MESSAGE
     
     @staticmethod
     def get_model_display_name(model_id: str) -> str:
@@ -129,12 +151,16 @@ class LLMGenerator:
 
 
 _llm_generator_instance = None
+_llm_generator_lock = threading.Lock()
 
 
 def get_llm_generator() -> LLMGenerator:
     global _llm_generator_instance
+    # Double-checked so concurrent first calls cannot build two instances
     if _llm_generator_instance is None:
-        _llm_generator_instance = LLMGenerator()
+        with _llm_generator_lock:
+            if _llm_generator_instance is None:
+                _llm_generator_instance = LLMGenerator()
     return _llm_generator_instance
 
 
@@ -0,0 +1,134 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Callable, Union, Iterator, Tuple
+
+import pypdfium2 as pdfium
+
+from config import PDF_EXTRACTION_WORKERS, PDF_PAGES_PER_SHARD
+
+
+PdfSource = Union[str, bytes]
+
+
+def _open_pdf(source: PdfSource) -> pdfium.PdfDocument:
+    # PDFium reads paths and raw bytes directly; no temp file round-trip
+    return pdfium.PdfDocument(source)
+
+
+def count_pages(source: PdfSource) -> int:
+    pdf = _open_pdf(source)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def extract_page_range(source: PdfSource, page_numbers: List[int]) -> List[Dict[str, Any]]:
+    pages_data = []
+    pdf = _open_pdf(source)
+    try:
+        for page_number in page_numbers:
+            page = pdf[page_number - 1]
+            textpage = page.get_textpage()
+            # PDFium separates lines with CRLF; normalise to match the splitter's separators
+            text = textpage.get_text_range().replace("\r\n", "\n")
+            textpage.close()
+            page.close()
+            if text and text.strip():
+                pages_data.append({
+                    "text": text,
+                    "page_number": page_number
+                })
+    finally:
+        pdf.close()
+    return pages_data
+
+
+def plan_shards(page_count: int, pages_per_shard: int = PDF_PAGES_PER_SHARD) -> List[List[int]]:
+    return [
+        list(range(start, min(start + pages_per_shard, page_count + 1)))
+        for start in range(1, page_count + 1, pages_per_shard)
+    ]
+
+
+def iter_extract_pdfs(
+    sources: List[PdfSource],
+    max_workers: int = PDF_EXTRACTION_WORKERS,
+    pages_per_shard: int = PDF_PAGES_PER_SHARD,
+    progress_callback: Optional[Callable[[int, int], None]] = None
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    # Yields (file_idx, result) as soon as every shard of a file is done, so the
+    # caller can embed one file while worker processes keep extracting the rest
+    results = [{"pages": [], "error": None} for _ in sources]
+
+    shards = []
+    file_shards = [[] for _ in sources]
+    for file_idx, source in enumerate(sources):
+        try:
+            for page_numbers in plan_shards(count_pages(source), pages_per_shard):
+                file_shards[file_idx].append(len(shards))
+                shards.append((file_idx, source, page_numbers))
+        except Exception as e:
+            results[file_idx]["error"] = str(e)
+
+    for file_idx, shard_ids in enumerate(file_shards):
+        if not shard_ids:
+            yield file_idx, results[file_idx]
+
+    shard_pages = [None] * len(shards)
+    remaining = [len(shard_ids) for shard_ids in file_shards]
+
+    def complete_shard(shard_idx: int, pages: Optional[List[Dict[str, Any]]], error: Optional[str]):
+        file_idx = shards[shard_idx][0]
+        shard_pages[shard_idx] = pages
+        if error:
+            results[file_idx]["error"] = error
+        remaining[file_idx] -= 1
+        if remaining[file_idx] > 0:
+            return None
+        # Shards were planned in page order, so concatenating keeps pages sorted
+        if results[file_idx]["error"] is None:
+            for shard_id in file_shards[file_idx]:
+                results[file_idx]["pages"].extend(shard_pages[shard_id] or [])
+        return file_idx
+
+    if len(shards) <= 1 or max_workers <= 1:
+        for shard_idx, (_, source, page_numbers) in enumerate(shards):
+            pages, error = None, None
+            try:
+                pages = extract_page_range(source, page_numbers)
+            except Exception as e:
+                error = str(e)
+            if progress_callback:
+                progress_callback(shard_idx + 1, len(shards))
+            file_idx = complete_shard(shard_idx, pages, error)
+            if file_idx is not None:
+                yield file_idx, results[file_idx]
+    else:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(shards))) as executor:
+            futures = {
+                executor.submit(extract_page_range, source, page_numbers): shard_idx
+                for shard_idx, (_, source, page_numbers) in enumerate(shards)
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                pages, error = None, None
+                try:
+                    pages = future.result()
+                except Exception as e:
+                    error = str(e)
+                if progress_callback:
+                    progress_callback(done, len(shards))
+                file_idx = complete_shard(futures[future], pages, error)
+                if file_idx is not None:
+                    yield file_idx, results[file_idx]
+
+
+def extract_pdfs(
+    sources: List[PdfSource],
+    max_workers: int = PDF_EXTRACTION_WORKERS,
+    pages_per_shard: int = PDF_PAGES_PER_SHARD,
+    progress_callback: Optional[Callable[[int, int], None]] = None
+) -> List[Dict[str, Any]]:
+    results = [None] * len(sources)
+    for file_idx, result in iter_extract_pdfs(sources, max_workers, pages_per_shard, progress_callback):
+        results[file_idx] = result
+    return results
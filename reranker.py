@@ -0,0 +1,136 @@
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import onnxruntime as ort
+from flashrank import Ranker, RerankRequest
+from flashrank.Config import model_file_map
+
+
+# Matches encoder layer node names as exported by torch/optimum, e.g. "/bert/encoder/layer.11/output/..."
+_LAYER_PATTERN = re.compile(r"layer\.(\d+)/")
+
+
+def _layer_index(node_name: str) -> Optional[int]:
+    match = _LAYER_PATTERN.search(node_name)
+    return int(match.group(1)) if match else None
+
+
+def find_layer_outputs(graph) -> Dict[int, str]:
+    # A layer's output is the tensor it produces that is consumed outside that layer
+    # (by the next layer, or by the pooler/classifier head after the last one)
+    producer_layer = {}
+    producer_inputs = {}
+    for node in graph.node:
+        layer = _layer_index(node.name)
+        if layer is not None:
+            for output in node.output:
+                producer_layer[output] = layer
+                producer_inputs[output] = node.input
+
+    boundaries: Dict[int, set] = {}
+    for node in graph.node:
+        consumer_layer = _layer_index(node.name)
+        for tensor in node.input:
+            layer = producer_layer.get(tensor)
+            if layer is not None and layer != consumer_layer:
+                boundaries.setdefault(layer, set()).add(tensor)
+    for output in graph.output:
+        layer = producer_layer.get(output.name)
+        if layer is not None:
+            boundaries.setdefault(layer, set()).add(output.name)
+
+    # Quantized graphs add a DynamicQuantizeLinear named after the producing layer that
+    # feeds the next one; keep only tensors not derived from another boundary tensor
+    for layer, tensors in boundaries.items():
+        boundaries[layer] = {
+            tensor for tensor in tensors
+            if not any(source in tensors for source in producer_inputs[tensor])
+        }
+
+    if any(len(tensors) != 1 for tensors in boundaries.values()):
+        raise ValueError("Could not identify a single output tensor per encoder layer")
+    return {layer: tensors.pop() for layer, tensors in boundaries.items()}
+
+
+def truncate_encoder_layers(src_path: str, dst_path: str, keep_layers: int) -> bool:
+    # Rewires the head onto the output of layer keep_layers - 1 and prunes the layers after it.
+    # Returns False when the graph already has keep_layers layers or fewer.
+    import onnx
+    from onnx.utils import Extractor
+
+    model = onnx.load(src_path)
+    graph = model.graph
+    layer_outputs = find_layer_outputs(graph)
+    if not layer_outputs:
+        raise ValueError(f"No encoder layers found in {src_path}")
+
+    last_layer = max(layer_outputs)
+    if keep_layers < 1 or keep_layers > last_layer:
+        return False
+
+    old_output = layer_outputs[last_layer]
+    new_output = layer_outputs[keep_layers - 1]
+    for node in graph.node:
+        if _layer_index(node.name) is None:
+            for i, tensor in enumerate(node.input):
+                if tensor == old_output:
+                    node.input[i] = new_output
+
+    input_names: List[str] = [i.name for i in graph.input]
+    output_names: List[str] = [o.name for o in graph.output]
+    truncated = Extractor(model).extract_model(input_names, output_names)
+
+    os.makedirs(os.path.dirname(dst_path) or ".", exist_ok=True)
+    onnx.save(truncated, dst_path)
+    return True
+
+
+def apply_layer_truncation(ranker: Ranker, model_name: str, keep_layers: int) -> bool:
+    # Swaps the Ranker's ONNX session for one running only the first keep_layers encoder layers.
+    # The truncated graph is cached next to the downloaded model.
+    src_path = os.path.join(ranker.model_dir, model_file_map[model_name])
+    dst_path = os.path.join(ranker.cache_dir, f"{model_name}_truncated_{keep_layers}.onnx")
+
+    if not os.path.exists(dst_path) and not truncate_encoder_layers(src_path, dst_path, keep_layers):
+        return False
+    ranker.session = ort.InferenceSession(dst_path)
+    return True
+
+
+class TopKRanker(Ranker):
+    def _logits(self, query: str, passages: List[Dict[str, Any]]) -> np.ndarray:
+        # Same encoding as Ranker.rerank, stopping at the raw model output
+        encoded = self.tokenizer.encode_batch([[query, passage["text"]] for passage in passages])
+        input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        token_type_ids = np.array([e.type_ids for e in encoded], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+
+        onnx_input = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if np.any(token_type_ids != 0):
+            onnx_input["token_type_ids"] = token_type_ids
+        return self.session.run(None, onnx_input)[0]
+
+    def rerank(self, request: RerankRequest, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        passages = request.passages
+        if self.llm_model is not None or top_k is None or top_k >= len(passages):
+            return super().rerank(request)[:top_k]
+
+        logits = self._logits(request.query, passages)
+        if logits.shape[1] > 2:
+            return super().rerank(request)[:top_k]
+
+        # FlashRank's sigmoid (one logit) and two-class softmax are both the sigmoid of this
+        # margin, so select on raw logits in O(n) and only score the top_k that are returned
+        margin = logits[:, 0] if logits.shape[1] == 1 else logits[:, 1] - logits[:, 0]
+        top = np.argpartition(-margin, top_k - 1)[:top_k]
+        top = top[np.argsort(-margin[top])]
+        scores = 1 / (1 + np.exp(-margin[top]))
+
+        results = []
+        for i, score in zip(top, scores):
+            passage = passages[i]
+            passage["score"] = score
+            results.append(passage)
+        return results
@@ -0,0 +1,95 @@
+import threading
+from typing import List, Dict, Any, Optional, Tuple, Hashable, Sequence
+
+import numpy as np
+
+from config import RESPONSE_CACHE_THRESHOLD, RESPONSE_CACHE_MAX_ENTRIES
+
+
+class SemanticResponseCache:
+    def __init__(
+        self,
+        threshold: float = RESPONSE_CACHE_THRESHOLD,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.clear()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(
+        self,
+        query_embedding: Sequence[float],
+        scope: Hashable = None
+    ) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        query = self._normalize(query_embedding)
+
+        with self._lock:
+            scope_id = self._scope_ids.get(scope)
+            if self._size == 0 or scope_id is None:
+                return None
+
+            # Rows are unit vectors, so the dot product is the cosine similarity
+            scores = self._embeddings[:self._size] @ query
+            scores[self._row_scopes[:self._size] != scope_id] = -np.inf
+
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            return self._entries[best]
+
+    def add(
+        self,
+        query_embedding: Sequence[float],
+        answer: str,
+        sources: List[Dict[str, Any]],
+        scope: Hashable = None
+    ) -> None:
+        if self.max_entries <= 0:
+            return
+        row = self._normalize(query_embedding)
+
+        with self._lock:
+            if self._embeddings is None:
+                # One contiguous float32 buffer, allocated once the embedding dimension is known
+                self._embeddings = np.empty((self.max_entries, row.shape[0]), dtype=np.float32)
+
+            # Ring buffer: once full, the oldest answer is overwritten
+            slot = self._next
+            self._embeddings[slot] = row
+            self._row_scopes[slot] = self._scope_ids.setdefault(scope, len(self._scope_ids))
+            self._entries[slot] = (answer, sources)
+            self._next = (slot + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._embeddings = None
+            self._row_scopes = np.empty(max(self.max_entries, 0), dtype=np.int64)
+            self._scope_ids: Dict[Hashable, int] = {}
+            self._entries: List[Optional[Tuple[str, List[Dict[str, Any]]]]] = [None] * max(self.max_entries, 0)
+            self._next = 0
+            self._size = 0
+
+
+_response_cache_instance = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> SemanticResponseCache:
+    global _response_cache_instance
+    # Double-checked so concurrent first calls cannot build two instances
+    if _response_cache_instance is None:
+        with _response_cache_lock:
+            if _response_cache_instance is None:
+                _response_cache_instance = SemanticResponseCache()
+    return _response_cache_instance
@@ -1,133 +1,419 @@
-from typing import List, Dict, Any, Tuple
-from flashrank import Ranker, RerankRequest
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Dict, Any, Tuple, Optional
+from flashrank import RerankRequest
 
 from config import (
     TOP_K_INITIAL,
     TOP_K_RERANKED,
-    RERANKER_MODEL_NAME
+    SKIP_RERANK_MARGIN,
+    RECALL_MODE_TOP_K,
+    RETRIEVAL_BATCH_WINDOW_MS,
+    RETRIEVAL_MAX_BATCH_SIZE,
+    MAX_RETRIEVAL_CONCURRENCY,
+    RETRIEVAL_CACHE_SIZE,
+    RERANKER_MODEL_NAME,
+    RERANKER_TRUNCATE_LAYER
 )
+from reranker import TopKRanker, apply_layer_truncation
 from vector_store import get_vector_store
 
+logger = logging.getLogger(__name__)
+
+
+# Slots keep each result a fixed-layout object instead of a per-result dict hash table;
+# use dataclasses.asdict where a plain dict is needed
+@dataclass(slots=True)
+class RetrievalResult:
+    id: str
+    score: float
+    original_score: float
+    text: str
+    source: str
+    chunk_index: int
+    page_number: int
+    metadata: Dict[str, Any]
+
+
+def _to_result(meta: Dict[str, Any], score: float) -> RetrievalResult:
+    # meta is a vector store search result; score is the final (reranked or vector) score
+    return RetrievalResult(
+        meta["id"],
+        score,
+        meta["score"],
+        meta["text"],
+        meta["source"],
+        meta["chunk_index"],
+        meta.get("page_number", -1),
+        meta["metadata"]
+    )
+
 
 class RetrievalEngine:
-    def __init__(self):
+    def __init__(
+        self,
+        max_concurrency: int = MAX_RETRIEVAL_CONCURRENCY,
+        cache_size: int = RETRIEVAL_CACHE_SIZE
+    ):
         self.vector_store = get_vector_store()
         self._reranker = None
-        print("Retrieval Engine initialized")
+        self._reranker_lock = threading.Lock()
+        # Per-thread RerankRequest, refilled for every query instead of reallocated
+        self._tls = threading.local()
+        # LRU of (results, debug_info) keyed on the store's write generation, the query and retrieval options
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Qdrant calls and FlashRank's ONNX run release the GIL, so concurrent retrievals overlap
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="retrieval")
+        self._batcher = None
+        self._batcher_lock = threading.Lock()
+        logger.info("Retrieval Engine initialized")
     
     @property
     def reranker(self):
         if self._reranker is None:
-            print(f"Loading FlashRank: {RERANKER_MODEL_NAME}")
-            try:
-                self._reranker = Ranker(model_name=RERANKER_MODEL_NAME, cache_dir="./flashrank_cache")
-                print("FlashRank ready!")
-            except Exception as e:
-                print(f"FlashRank could not be loaded: {e}")
-                raise
+            with self._reranker_lock:
+                if self._reranker is None:
+                    logger.info("Loading FlashRank: %s", RERANKER_MODEL_NAME)
+                    try:
+                        ranker = TopKRanker(model_name=RERANKER_MODEL_NAME, cache_dir="./flashrank_cache")
+                        if RERANKER_TRUNCATE_LAYER:
+                            self._truncate_reranker(ranker)
+                        self._reranker = ranker
+                        logger.info("FlashRank ready!")
+                    except Exception:
+                        logger.exception("FlashRank could not be loaded")
+                        raise
         return self._reranker
     
+    def _warm_up_reranker(self):
+        # Load FlashRank on a worker while the vector search runs; the rerank stage
+        # then waits on the reranker lock instead of loading the model after the search
+        if self._reranker is None:
+            self._executor.submit(lambda: self.reranker)
+    
+    def _truncate_reranker(self, ranker: TopKRanker):
+        # Truncation is an optimization only; fall back to the full model if the graph cannot be cut
+        try:
+            if apply_layer_truncation(ranker, RERANKER_MODEL_NAME, RERANKER_TRUNCATE_LAYER):
+                logger.info("FlashRank truncated to %d layers", RERANKER_TRUNCATE_LAYER)
+        except Exception as e:
+            logger.warning("FlashRank truncation failed, using the full model: %s", e)
+    
+    def _resolve_top_k_initial(self, top_k_initial: int, recall_mode: Optional[str]) -> int:
+        # A recall mode overrides top_k_initial with its calibrated candidate count
+        if recall_mode is None:
+            return top_k_initial
+        if recall_mode not in RECALL_MODE_TOP_K:
+            raise ValueError(f"Unknown recall_mode: {recall_mode}. Expected one of {list(RECALL_MODE_TOP_K)}")
+        return RECALL_MODE_TOP_K[recall_mode]
+    
+    def _cache_get(self, key: Tuple) -> Optional[Tuple[List[RetrievalResult], Dict[str, Any]]]:
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            self._cache.move_to_end(key)
+        # Copies so callers cannot mutate the cached entry
+        results, debug_info = entry
+        return list(results), {**debug_info, "cache_hit": True}
+    
+    def _cache_put(self, key: Tuple, results: List[RetrievalResult], debug_info: Dict[str, Any]):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = (list(results), dict(debug_info))
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    def clear_cache(self):
+        # Writes through the vector store already miss the cache; this also frees the memory
+        with self._cache_lock:
+            self._cache.clear()
+    
     def retrieve(
         self, 
         query: str, 
         use_reranking: bool = True,
         top_k_initial: int = TOP_K_INITIAL,
-        top_k_final: int = TOP_K_RERANKED
-    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        top_k_final: int = TOP_K_RERANKED,
+        recall_mode: Optional[str] = None
+    ) -> Tuple[List[RetrievalResult], Dict[str, Any]]:
+        top_k_initial = self._resolve_top_k_initial(top_k_initial, recall_mode)
+        
+        cache_key = (self.vector_store.generation, query, use_reranking, top_k_initial, top_k_final, recall_mode)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
         debug_info = {
             "query": query,
             "use_reranking": use_reranking,
+            "recall_mode": recall_mode,
             "top_k_initial": top_k_initial,
             "top_k_final": top_k_final
         }
         
+        if use_reranking:
+            self._warm_up_reranker()
+        
         try:
             initial_results = self.vector_store.search(
                 query=query, 
                 top_k=top_k_initial
             )
-            
-            debug_info["stage1_count"] = len(initial_results)
-            debug_info["stage1_top_score"] = initial_results[0]["score"] if initial_results else 0
-            
-            if not use_reranking or len(initial_results) == 0:
-                final_results = initial_results[:top_k_final]
-                debug_info["final_method"] = "vector_only"
-                return final_results, debug_info
-            
-            passages = [
-                {"id": i, "text": r["text"], "meta": r}
-                for i, r in enumerate(initial_results)
-            ]
-            
-            rerank_request = RerankRequest(query=query, passages=passages)
-            reranked = self.reranker.rerank(rerank_request)
-            
-            reranked_results = []
-            for item in reranked:
-                original_meta = item["meta"]
-                reranked_results.append({
-                    "id": original_meta["id"],
-                    "score": item["score"],
-                    "original_score": original_meta["score"],
-                    "text": item["text"],
-                    "source": original_meta["source"],
-                    "chunk_index": original_meta["chunk_index"],
-                    "page_number": original_meta.get("page_number", -1),
-                    "metadata": original_meta["metadata"]
-                })
-            
-            reranked_results.sort(key=lambda x: x["score"], reverse=True)
-            final_results = reranked_results[:top_k_final]
-            
-            debug_info["final_method"] = "reranked"
-            debug_info["stage2_top_score"] = final_results[0]["score"] if final_results else 0
-            
-            return final_results, debug_info
+            final_results, debug_info = self._rerank_stage(
+                query, initial_results, use_reranking, top_k_final, debug_info
+            )
             
         except Exception as e:
-            print(f"Retrieval error: {e}")
+            logger.exception("Retrieval error")
             debug_info["error"] = str(e)
             return [], debug_info
+        
+        self._cache_put(cache_key, final_results, debug_info)
+        return final_results, debug_info
+    
+    def retrieve_async(self, query: str, **options) -> Future:
+        # Runs the full retrieve pipeline on the bounded worker pool; options are retrieve keyword arguments
+        return self._executor.submit(self.retrieve, query, **options)
+    
+    def retrieve_batch(
+        self,
+        queries: List[str],
+        use_reranking: bool = True,
+        top_k_initial: int = TOP_K_INITIAL,
+        top_k_final: int = TOP_K_RERANKED,
+        recall_mode: Optional[str] = None
+    ) -> List[Tuple[List[RetrievalResult], Dict[str, Any]]]:
+        top_k_initial = self._resolve_top_k_initial(top_k_initial, recall_mode)
+        
+        outputs = [None] * len(queries)
+        pending = []
+        generation = self.vector_store.generation
+        for i, query in enumerate(queries):
+            cache_key = (generation, query, use_reranking, top_k_initial, top_k_final, recall_mode)
+            outputs[i] = self._cache_get(cache_key)
+            if outputs[i] is None:
+                pending.append((i, query, cache_key, {
+                    "query": query,
+                    "use_reranking": use_reranking,
+                    "recall_mode": recall_mode,
+                    "top_k_initial": top_k_initial,
+                    "top_k_final": top_k_final
+                }))
+        
+        if use_reranking and pending:
+            self._warm_up_reranker()
+        
+        if not pending:
+            return outputs
+        
+        # One embedding call and one Qdrant round-trip for every uncached query,
+        # then all reranks back-to-back on the warm ONNX session
+        try:
+            candidates = self.vector_store.search_batch(
+                [query for _, query, _, _ in pending],
+                top_k=top_k_initial
+            )
+        except Exception as e:
+            logger.exception("Retrieval error")
+            for i, _, _, debug_info in pending:
+                debug_info["error"] = str(e)
+                outputs[i] = ([], debug_info)
+            return outputs
+        
+        for (i, query, cache_key, debug_info), initial_results in zip(pending, candidates):
+            try:
+                outputs[i] = self._rerank_stage(
+                    query, initial_results, use_reranking, top_k_final, debug_info
+                )
+            except Exception as e:
+                logger.exception("Retrieval error")
+                debug_info["error"] = str(e)
+                outputs[i] = ([], debug_info)
+                continue
+            self._cache_put(cache_key, *outputs[i])
+        
+        return outputs
+    
+    def retrieve_many(self, queries: List[str], **options) -> Future:
+        # Runs retrieve_batch on the worker pool so callers can overlap other work with the batch
+        return self._executor.submit(self.retrieve_batch, queries, **options)
     
-    def build_context(self, results: List[Dict[str, Any]]) -> str:
+    def submit(self, query: str, **options) -> Future:
+        # Queue the query for the micro-batching worker; options are retrieve_batch keyword arguments
+        with self._batcher_lock:
+            if self._batcher is None:
+                self._batcher = RetrievalBatcher(self)
+        return self._batcher.submit(query, **options)
+    
+    def _rerank_stage(
+        self,
+        query: str,
+        initial_results: List[Dict[str, Any]],
+        use_reranking: bool,
+        top_k_final: int,
+        debug_info: Dict[str, Any]
+    ) -> Tuple[List[RetrievalResult], Dict[str, Any]]:
+        debug_info["stage1_count"] = len(initial_results)
+        debug_info["stage1_top_score"] = initial_results[0]["score"] if initial_results else 0
+        
+        if not use_reranking or len(initial_results) == 0:
+            final_results = [_to_result(r, r["score"]) for r in initial_results[:top_k_final]]
+            debug_info["final_method"] = "vector_only"
+            return final_results, debug_info
+        
+        # Skip FlashRank when it could not change which results are returned,
+        # or when the vector scores already separate the top result clearly
+        if len(initial_results) <= top_k_final:
+            skip_method = "vector_only_small"
+        elif initial_results[0]["score"] - initial_results[top_k_final - 1]["score"] > SKIP_RERANK_MARGIN:
+            skip_method = "vector_only_confident"
+        else:
+            skip_method = None
+        if skip_method is not None:
+            final_results = [_to_result(r, r["score"]) for r in initial_results[:top_k_final]]
+            debug_info["final_method"] = skip_method
+            return final_results, debug_info
+        
+        rerank_request = self._rerank_request(query, initial_results)
+        # Only the top_k_final passages are scored and returned, best first
+        reranked = self.reranker.rerank(rerank_request, top_k=top_k_final)
+        
+        final_results = [
+            _to_result(initial_results[item["id"]], item["score"])
+            for item in reranked
+        ]
+        
+        debug_info["final_method"] = "reranked"
+        debug_info["stage2_top_score"] = reranked[0]["score"] if reranked else 0
+        
+        return final_results, debug_info
+    
+    def _rerank_request(self, query: str, initial_results: List[Dict[str, Any]]) -> RerankRequest:
+        request = getattr(self._tls, "request", None)
+        if request is None:
+            request = self._tls.request = RerankRequest(query="", passages=[])
+        
+        # FlashRank only reads "text"; the id indexes back into initial_results.
+        # Passages are rebuilt each time since FlashRank writes scores into them and sorts the list
+        request.query = query
+        request.passages[:] = [
+            {"id": i, "text": r["text"]}
+            for i, r in enumerate(initial_results)
+        ]
+        return request
+    
+    def build_context(self, results: List[RetrievalResult]) -> str:
         if not results:
             return "No context found."
         
-        context_parts = []
-        for i, r in enumerate(results, 1):
-            source = r.get("source", "Unknown Source")
-            page = r.get("page_number", -1)
-            text = r.get("text", "")
-            
-            if page > 0:
-                context_parts.append(f"[Kaynak {i}: {source}, Sayfa {page}]\n{text}")
-            else:
-                context_parts.append(f"[Kaynak {i}: {source}]\n{text}")
-        
-        return "\n\n---\n\n".join(context_parts)
+        # Plain loop with a local counter and bound methods instead of enumerate in a generator
+        parts = []
+        append = parts.append
+        format_part = self._format_context_part
+        i = 0
+        for r in results:
+            i += 1
+            append(format_part(i, r))
+        return "\n\n---\n\n".join(parts)
+    
+    @staticmethod
+    def _format_context_part(i: int, r: RetrievalResult) -> str:
+        if r.page_number > 0:
+            return "[Kaynak %d: %s, Sayfa %d]\n%s" % (i, r.source, r.page_number, r.text)
+        return "[Kaynak %d: %s]\n%s" % (i, r.source, r.text)
     
-    def format_sources(self, results: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    def format_sources(self, results: List[RetrievalResult]) -> List[Dict[str, Any]]:
         sources = []
-        for i, r in enumerate(results, 1):
-            sources.append({
+        append = sources.append
+        i = 0
+        for r in results:
+            i += 1
+            append({
                 "index": i,
-                "source": r.get("source", "Bilinmeyen"),
-                "page_number": r.get("page_number", -1),
-                "text": r.get("text", ""),
-                "score": r.get("score", 0),
-                "original_score": r.get("original_score", r.get("score", 0))
+                "source": r.source,
+                "page_number": r.page_number,
+                "text": r.text,
+                "score": r.score,
+                "original_score": r.original_score
             })
         return sources
 
 
+class RetrievalBatcher:
+    def __init__(
+        self,
+        engine: RetrievalEngine,
+        window_ms: float = RETRIEVAL_BATCH_WINDOW_MS,
+        max_batch_size: int = RETRIEVAL_MAX_BATCH_SIZE
+    ):
+        self.engine = engine
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+    
+    def submit(self, query: str, **options) -> Future:
+        future = Future()
+        self._queue.put((query, options, future))
+        return future
+    
+    def _drain(self) -> List[Tuple[str, Dict[str, Any], Future]]:
+        # Block for the first query, then collect more until the window closes or the batch is full
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        while True:
+            batch = self._drain()
+            
+            # Only queries with identical options can share a retrieve_batch call
+            groups = {}
+            for query, options, future in batch:
+                if future.set_running_or_notify_cancel():
+                    groups.setdefault(tuple(sorted(options.items())), []).append((query, future))
+            
+            for options, items in groups.items():
+                try:
+                    outputs = self.engine.retrieve_batch([query for query, _ in items], **dict(options))
+                except Exception as e:
+                    for _, future in items:
+                        future.set_exception(e)
+                    continue
+                for (_, future), output in zip(items, outputs):
+                    future.set_result(output)
+
+
 _retrieval_engine_instance = None
+_retrieval_engine_lock = threading.Lock()
 
 
 def get_retrieval_engine() -> RetrievalEngine:
     global _retrieval_engine_instance
+    # Double-checked so concurrent first calls cannot build two instances
     if _retrieval_engine_instance is None:
-        _retrieval_engine_instance = RetrievalEngine()
+        with _retrieval_engine_lock:
+            if _retrieval_engine_instance is None:
+                _retrieval_engine_instance = RetrievalEngine()
     return _retrieval_engine_instance
 
 
@@ -0,0 +1,91 @@
+"""Calibrate the number of reranker candidates (TOP_K_INITIAL / RECALL_MODE_TOP_K).
+
+Sweeps the first-stage candidate count against a held-out QA set and reports
+Recall@TOP_K_RERANKED and mean retrieval latency for each K. The suggested K is
+the smallest one whose recall stays within epsilon of the best recall.
+
+The QA set is a JSONL file, one question per line:
+    {"question": "KDV oranı nedir?", "source": "kdv_mevzuati.pdf", "page_number": 3}
+"page_number" is optional; without it any chunk from the source counts as a hit.
+
+Documents must already be ingested into the configured Qdrant collection.
+
+Usage:
+    python tests/calibrate_top_k.py qa_set.jsonl --k 5 10 15 25 50 --epsilon 0.01
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List, Dict, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import TOP_K_RERANKED
+from retrieval import RetrievalResult, get_retrieval_engine
+
+
+def load_qa_set(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def is_hit(results: List[RetrievalResult], example: Dict[str, Any]) -> bool:
+    for r in results:
+        if r.source != example["source"]:
+            continue
+        if "page_number" not in example or r.page_number == example["page_number"]:
+            return True
+    return False
+
+
+def evaluate(qa_set: List[Dict[str, Any]], top_k_initial: int, top_k_final: int) -> Dict[str, float]:
+    engine = get_retrieval_engine()
+    hits = 0
+    elapsed = 0.0
+    for example in qa_set:
+        start = time.perf_counter()
+        results, _ = engine.retrieve(
+            query=example["question"],
+            use_reranking=True,
+            top_k_initial=top_k_initial,
+            top_k_final=top_k_final
+        )
+        elapsed += time.perf_counter() - start
+        hits += is_hit(results, example)
+    return {
+        "recall": hits / len(qa_set),
+        "latency_ms": 1000 * elapsed / len(qa_set)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate TOP_K_INITIAL against a QA set")
+    parser.add_argument("qa_set", help="JSONL file with question/source[/page_number]")
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10, 15, 25, 50])
+    parser.add_argument("--top-k-final", type=int, default=TOP_K_RERANKED)
+    parser.add_argument("--epsilon", type=float, default=0.01, help="Allowed recall loss")
+    args = parser.parse_args()
+
+    qa_set = load_qa_set(args.qa_set)
+    if not qa_set:
+        print("QA set is empty")
+        return
+
+    # Warm up the embedder and reranker so the first K is not charged for model loading
+    evaluate(qa_set[:1], max(args.k), args.top_k_final)
+
+    scores = {}
+    print(f"{'K':>5} {'Recall@' + str(args.top_k_final):>10} {'Latency (ms)':>14}")
+    for k in sorted(args.k):
+        scores[k] = evaluate(qa_set, k, args.top_k_final)
+        print(f"{k:>5} {scores[k]['recall']:>10.3f} {scores[k]['latency_ms']:>14.1f}")
+
+    best_recall = max(s["recall"] for s in scores.values())
+    chosen = min(k for k, s in scores.items() if s["recall"] >= best_recall - args.epsilon)
+    print(f"\nSmallest K within {args.epsilon} of best recall ({best_recall:.3f}): {chosen}")
+
+
+if __name__ == "__main__":
+    main()
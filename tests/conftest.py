@@ -1,4 +1,5 @@
 """Pytest configuration and shared fixtures."""
+import logging
 import pytest
 import sys
 import os
@@ -6,6 +7,15 @@ import os
 # Add project root to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Store setup logs once per VectorStore; only warnings and errors are worth test output
+logging.getLogger("vector_store").setLevel(logging.WARNING)
+
+
+@pytest.fixture(autouse=True)
+def disable_embedding_cache(monkeypatch):
+    """Keep tests away from the on-disk embedding cache."""
+    monkeypatch.setattr("embeddings.EMBEDDING_CACHE_DIR", "")
+
 
 @pytest.fixture
 def sample_documents():
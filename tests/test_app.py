@@ -0,0 +1,181 @@
+"""Unit tests for app module."""
+import unittest
+import tempfile
+from unittest.mock import Mock, patch
+import sys
+import os
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing app starts the embedder warmup thread; keep it off the real model
+with patch('embeddings.get_embedder'):
+    import app
+
+from semantic_text_splitter import TextSplitter
+from llm_generator import LLM_ERROR_MESSAGE
+
+
+class TestChunkDocument(unittest.TestCase):
+    """Test whole-document chunking and the chunk to page mapping."""
+
+    def chunk_with(self, pages_data, chunks):
+        """Run chunk_document with a splitter returning fixed (offset, text) chunks."""
+        splitter = Mock()
+        splitter.chunk_indices.return_value = chunks
+        with patch("app._SPLITTER", splitter):
+            return app.chunk_document(pages_data, "doc.pdf")
+
+    def test_page_assignment_at_boundaries(self):
+        """Verify chunks starting at a page start or inside the separator map to that page."""
+        pages_data = [{"text": "abc", "page_number": 1}, {"text": "defg", "page_number": 3}]
+        # Full text is "abc\n\ndefg": the separator is offsets 3-4, page 3 starts at 5
+        chunks = [(0, "abc"), (2, "c"), (3, "\n"), (4, "\nd"), (5, "defg")]
+
+        results = self.chunk_with(pages_data, chunks)
+
+        self.assertEqual([r["page_number"] for r in results], [1, 1, 3, 3, 3])
+        self.assertEqual([r["chunk_index"] for r in results], [0, 1, 2, 3, 4])
+
+    def test_turkish_text_maps_to_correct_page(self):
+        """Verify character offsets of multi-byte Turkish text land on the right pages."""
+        pages_data = [
+            {"text": "Gümrük vergisi ağır. Çiğ süt ödenir.", "page_number": 1},
+            {"text": "İşçi ücretleri şöyle hesaplanır.", "page_number": 2},
+            {"text": "Ödeme günü çarşamba öğleden sonradır.", "page_number": 3}
+        ]
+        with patch("app._SPLITTER", TextSplitter(capacity=25)):
+            results = app.chunk_document(pages_data, "vergi.pdf")
+
+        self.assertEqual([r["page_number"] for r in results], [1, 1, 2, 2, 3, 3])
+        for r in results:
+            self.assertIn(r["text"], pages_data[r["page_number"] - 1]["text"])
+
+    def test_chunk_id_is_stable(self):
+        """Verify chunk IDs do not depend on the process, so re-ingest overwrites."""
+        self.assertEqual(app.chunk_id("kdv.pdf", 1, 0, "KDV oranı %20"), 879831870167266336)
+
+    def test_chunk_id_changes_with_position(self):
+        """Verify source, page and chunk index each give a distinct ID."""
+        ids = {
+            app.chunk_id("kdv.pdf", 1, 0, "KDV oranı %20"),
+            app.chunk_id("otv.pdf", 1, 0, "KDV oranı %20"),
+            app.chunk_id("kdv.pdf", 2, 0, "KDV oranı %20"),
+            app.chunk_id("kdv.pdf", 1, 1, "KDV oranı %20")
+        }
+
+        self.assertEqual(len(ids), 4)
+
+
+class TestCacheOnCompletion(unittest.TestCase):
+    """Test that only complete answers reach the response cache."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.mock_cache = Mock()
+        patcher = patch('app.get_response_cache', return_value=self.mock_cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_complete_answer_is_cached(self):
+        """Verify a fully streamed answer is cached once the stream ends."""
+        stream = app.cache_on_completion(iter(["KDV ", "%20"]), [1.0, 0.0], [], scope=None)
+
+        self.assertEqual("".join(stream), "KDV %20")
+        self.mock_cache.add.assert_called_once_with([1.0, 0.0], "KDV %20", [], scope=None)
+
+    def test_mid_stream_failure_is_not_cached(self):
+        """Verify a partial answer followed by the error marker is streamed but not cached."""
+        stream = app.cache_on_completion(iter(["KDV ", LLM_ERROR_MESSAGE]), [1.0, 0.0], [], scope=None)
+
+        self.assertEqual("".join(stream), "KDV " + LLM_ERROR_MESSAGE)
+        self.mock_cache.add.assert_not_called()
+
+    @patch('llm_generator.Groq')
+    def test_stream_request_failure_falls_back_to_generate(self, mock_groq):
+        """Verify a Groq request failing before the first token is retried without streaming."""
+        from llm_generator import LLMGenerator
+
+        def create(**kwargs):
+            if kwargs.get("stream"):
+                raise ConnectionError("stream refused")
+            return Mock(choices=[Mock(message=Mock(content="KDV %20"))])
+
+        mock_groq.return_value.chat.completions.create.side_effect = create
+        llm = LLMGenerator(api_key="test_key")
+
+        stream = app.cache_on_completion(
+            app.stream_with_fallback(llm, question="q", context="c"), [1.0, 0.0], [], scope=None
+        )
+
+        self.assertEqual(list(stream), ["KDV %20"])
+        self.mock_cache.add.assert_called_once_with([1.0, 0.0], "KDV %20", [], scope=None)
+
+    def test_stream_exception_after_tokens_is_not_cached(self):
+        """Verify an exception raised mid-stream ends the answer with the error marker."""
+        def failing_stream(**kwargs):
+            yield "KDV "
+            raise ConnectionError("dropped")
+
+        llm = Mock()
+        llm.generate_stream.side_effect = failing_stream
+        stream = app.cache_on_completion(
+            app.stream_with_fallback(llm, question="q"), [1.0, 0.0], [], scope=None
+        )
+
+        self.assertEqual(list(stream), ["KDV ", LLM_ERROR_MESSAGE])
+        llm.generate.assert_not_called()
+        self.mock_cache.add.assert_not_called()
+
+
+
+class TestIngestCacheKey(unittest.TestCase):
+    """Test the ingest cache key covers everything that shapes cached chunks."""
+
+    def test_key_is_stable(self):
+        """Verify the same bytes and settings give the same key."""
+        self.assertEqual(app.ingest_cache_key(b"%PDF-1.7"), app.ingest_cache_key(b"%PDF-1.7"))
+
+    def test_key_changes_with_content(self):
+        """Verify different files get different keys."""
+        self.assertNotEqual(app.ingest_cache_key(b"%PDF-1.7 a"), app.ingest_cache_key(b"%PDF-1.7 b"))
+
+    def test_key_changes_with_ingest_settings(self):
+        """Verify the model, chunking settings and cache version are part of the key."""
+        key = app.ingest_cache_key(b"%PDF-1.7")
+        for name, value in [
+            ("EMBEDDING_MODEL_NAME", "intfloat/multilingual-e5-base"),
+            ("CHUNK_SIZE", 500),
+            ("CHUNK_OVERLAP", 100),
+            ("VECTOR_DATATYPE", "float32"),
+            ("INGEST_CACHE_VERSION", -1)
+        ]:
+            with self.subTest(setting=name), patch(f"app.{name}", value):
+                self.assertNotEqual(app.ingest_cache_key(b"%PDF-1.7"), key)
+
+
+
+class TestIngestCacheFiles(unittest.TestCase):
+    """Test ingest cache persistence."""
+
+    def test_roundtrip_keeps_stored_precision(self):
+        """Verify cached vectors come back exactly as Qdrant would store a fresh upload."""
+        embeddings = np.random.default_rng(0).normal(size=(3, 8)).astype(np.float32)
+
+        with tempfile.TemporaryDirectory() as tmp, \
+                patch("app.INGEST_CACHE_DIR", tmp), patch("app.VECTOR_DATATYPE", "float16"):
+            app.save_ingest_cache("key", ["a", "b", "c"], [{}, {}, {}], embeddings)
+            texts, metadatas, restored = app.load_ingest_cache("key")
+
+        self.assertEqual(texts, ["a", "b", "c"])
+        self.assertEqual(restored.dtype, np.float32)
+        np.testing.assert_array_equal(restored, embeddings.astype(np.float16).astype(np.float32))
+
+    def test_missing_entry_returns_none(self):
+        """Verify an unknown key is a cache miss."""
+        with tempfile.TemporaryDirectory() as tmp, patch("app.INGEST_CACHE_DIR", tmp):
+            self.assertIsNone(app.load_ingest_cache("missing"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -41,6 +41,11 @@ class TestConfigConstants(unittest.TestCase):
         self.assertIsInstance(RERANKER_MODEL_NAME, str)
         self.assertTrue(len(RERANKER_MODEL_NAME) > 0)
 
+    def test_reranker_model_is_int8_quantized(self):
+        """Verify the reranker resolves to FlashRank's quantized ONNX file."""
+        from flashrank.Config import model_file_map
+        self.assertTrue(model_file_map[RERANKER_MODEL_NAME].endswith("_Q.onnx"))
+
     def test_llm_models_is_dict(self):
         """Verify LLM models is a non-empty dictionary."""
         self.assertIsInstance(LLM_MODELS, dict)
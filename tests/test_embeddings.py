@@ -3,6 +3,7 @@ import unittest
 from unittest.mock import Mock, patch, MagicMock
 import sys
 import os
+import tempfile
 import numpy as np
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -52,6 +53,55 @@ class TestTurkishEmbedderInit(unittest.TestCase):
         # Now model should be loaded
         mock_st.assert_called_once()
 
+    @patch('embeddings.SentenceTransformer')
+    @patch('embeddings.torch')
+    def test_model_half_precision_on_cuda(self, mock_torch, mock_st):
+        """Verify model is cast to FP16 when running on CUDA."""
+        mock_torch.cuda.is_available.return_value = True
+
+        from embeddings import TurkishEmbedder
+        embedder = TurkishEmbedder(model_name="test-model")
+        _ = embedder.model
+
+        mock_st.return_value.half.assert_called_once()
+
+    @patch('embeddings.SentenceTransformer')
+    @patch('embeddings.torch')
+    def test_model_full_precision_on_cpu(self, mock_torch, mock_st):
+        """Verify model stays in FP32 on CPU."""
+        mock_torch.cuda.is_available.return_value = False
+
+        from embeddings import TurkishEmbedder
+        embedder = TurkishEmbedder(model_name="test-model")
+        _ = embedder.model
+
+        mock_st.return_value.half.assert_not_called()
+
+    @patch('embeddings.SentenceTransformer')
+    @patch('embeddings.torch')
+    def test_model_loaded_once_under_concurrent_access(self, mock_torch, mock_st):
+        """Verify concurrent first accesses share a single model load."""
+        import threading
+        import time
+        mock_torch.cuda.is_available.return_value = False
+
+        def slow_load(*args, **kwargs):
+            time.sleep(0.05)
+            return Mock()
+        mock_st.side_effect = slow_load
+
+        from embeddings import TurkishEmbedder
+        embedder = TurkishEmbedder(model_name="test-model")
+        models = []
+        threads = [threading.Thread(target=lambda: models.append(embedder.model)) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(mock_st.call_count, 1)
+        self.assertEqual(len({id(m) for m in models}), 1)
+
 
 class TestTurkishEmbedderMethods(unittest.TestCase):
     """Test TurkishEmbedder embedding methods."""
@@ -105,6 +155,23 @@ class TestTurkishEmbedderMethods(unittest.TestCase):
         call_args = self.mock_model.encode.call_args
         self.assertEqual(call_args[0][0], "query: test query")
 
+    @patch('embeddings.SentenceTransformer')
+    @patch('embeddings.torch')
+    def test_embed_queries_single_encode_call(self, mock_torch, mock_st):
+        """Verify embed_queries prefixes every query and encodes them in one call."""
+        mock_torch.cuda.is_available.return_value = False
+        self.mock_model.encode.return_value = np.array([[0.1, 0.2], [0.3, 0.4]])
+        mock_st.return_value = self.mock_model
+        
+        from embeddings import TurkishEmbedder
+        embedder = TurkishEmbedder()
+        
+        result = embedder.embed_queries(["q1", "q2"])
+        
+        self.mock_model.encode.assert_called_once()
+        self.assertEqual(self.mock_model.encode.call_args[0][0], ["query: q1", "query: q2"])
+        self.assertEqual(len(result), 2)
+
     @patch('embeddings.SentenceTransformer')
     @patch('embeddings.torch')
     def test_embed_documents_returns_list(self, mock_torch, mock_st):
@@ -121,6 +188,50 @@ class TestTurkishEmbedderMethods(unittest.TestCase):
         self.assertIsInstance(result, list)
         self.assertEqual(len(result), 2)
 
+    @patch('embeddings.SentenceTransformer')
+    @patch('embeddings.torch')
+    def test_embed_documents_length_bucketed_preserves_order(self, mock_torch, mock_st):
+        """Verify large batches are encoded sorted by length and returned in input order."""
+        mock_torch.cuda.is_available.return_value = False
+        self.mock_model.tokenizer.return_value = {"length": [5, 1, 3]}
+        self.mock_model.encode.side_effect = lambda batch, **kwargs: np.array(
+            [[float(len(text))] for text in batch]
+        )
+        mock_st.return_value = self.mock_model
+
+        from embeddings import TurkishEmbedder
+        embedder = TurkishEmbedder()
+        embedder.batch_size = 2
+
+        result = embedder.embed_documents(["aaaaa", "a", "aaa"])
+
+        first_batch = self.mock_model.encode.call_args_list[0][0][0]
+        self.assertEqual(first_batch, ["passage: a", "passage: aaa"])
+        self.assertEqual(result, [[14.0], [10.0], [12.0]])
+
+    @patch('embeddings.SentenceTransformer')
+    @patch('embeddings.torch')
+    def test_embed_documents_uses_cache(self, mock_torch, mock_st):
+        """Verify cached passages are not re-encoded."""
+        mock_torch.cuda.is_available.return_value = False
+        self.mock_model.encode.side_effect = lambda batch, **kwargs: np.array(
+            [[float(len(text))] for text in batch]
+        )
+        mock_st.return_value = self.mock_model
+
+        from embeddings import TurkishEmbedder
+        with tempfile.TemporaryDirectory() as cache_dir:
+            embedder = TurkishEmbedder(cache_dir=cache_dir)
+
+            first = embedder.embed_documents(["text1"])
+            second = embedder.embed_documents(["text1", "text22"])
+            embedder.cache.close()
+
+        self.assertEqual(first, [[14.0]])
+        self.assertEqual(second, [[14.0], [15.0]])
+        last_batch = self.mock_model.encode.call_args_list[-1][0][0]
+        self.assertEqual(last_batch, ["passage: text22"])
+
     @patch('embeddings.SentenceTransformer')
     @patch('embeddings.torch')
     def test_embed_query_returns_list(self, mock_torch, mock_st):
@@ -150,6 +261,7 @@ class TestTurkishEmbedderMethods(unittest.TestCase):
         result = embedder.embed_passages(["text1", "text2"])
         
         self.assertIsInstance(result, np.ndarray)
+        self.assertEqual(result.shape, (2, 2))
 
     @patch('embeddings.SentenceTransformer')
     @patch('embeddings.torch')
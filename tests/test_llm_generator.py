@@ -73,6 +73,45 @@ class TestLLMGeneratorFormatHistory(unittest.TestCase):
         # Content should be truncated to 500 chars
         self.assertLess(len(result), 600)
 
+    @patch('llm_generator.Groq')
+    @patch('llm_generator.CHAT_HISTORY_TOKEN_BUDGET', 250)
+    def test_format_history_respects_token_budget(self, mock_groq):
+        """Verify only the newest messages within the token budget are kept."""
+        from llm_generator import LLMGenerator
+
+        generator = LLMGenerator(api_key="test_key")
+        history = [
+            {"role": "user", "content": "old " + "A" * 496},
+            {"role": "assistant", "content": "mid " + "B" * 496},
+            {"role": "user", "content": "new " + "C" * 496}
+        ]
+
+        result = generator._format_chat_history(history)
+
+        self.assertNotIn("old", result)
+        self.assertTrue(result.startswith("Assistant: mid"))
+        self.assertIn("new", result)
+
+
+class TestRenderPrompt(unittest.TestCase):
+    """Test precompiled system prompt rendering."""
+
+    def test_render_prompt_matches_format(self):
+        """Verify fragment rendering matches str.format on the system prompt."""
+        from llm_generator import _render_prompt
+        from config import SYSTEM_PROMPT_TR
+
+        values = {
+            "context": "KDV orani %18'dir.",
+            "question": "KDV orani nedir? {not_a_field}",
+            "chat_history": "User: Merhaba"
+        }
+
+        self.assertEqual(
+            _render_prompt(**values),
+            SYSTEM_PROMPT_TR.format(**values)
+        )
+
 
 class TestLLMGeneratorGenerate(unittest.TestCase):
     """Test LLMGenerator generate method."""
@@ -0,0 +1,78 @@
+"""Unit tests for pdf_extractor module."""
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestPlanShards(unittest.TestCase):
+    """Test page shard planning."""
+
+    def test_plan_shards_covers_all_pages(self):
+        """Verify shards cover every page exactly once and in order."""
+        from pdf_extractor import plan_shards
+
+        shards = plan_shards(7, pages_per_shard=3)
+
+        self.assertEqual(shards, [[1, 2, 3], [4, 5, 6], [7]])
+
+    def test_plan_shards_empty_document(self):
+        """Verify a document without pages yields no shards."""
+        from pdf_extractor import plan_shards
+
+        self.assertEqual(plan_shards(0), [])
+
+
+class TestExtractPdfs(unittest.TestCase):
+    """Test extract_pdfs orchestration."""
+
+    @patch('pdf_extractor.extract_page_range')
+    @patch('pdf_extractor.count_pages')
+    def test_extract_pdfs_merges_shards_in_page_order(self, mock_count, mock_extract):
+        """Verify pages from all shards are merged per file in page order."""
+        mock_count.return_value = 4
+        mock_extract.side_effect = lambda path, pages: [
+            {"text": f"page {n}", "page_number": n} for n in pages
+        ]
+
+        from pdf_extractor import extract_pdfs
+        results = extract_pdfs(["a.pdf"], max_workers=1, pages_per_shard=2)
+
+        self.assertIsNone(results[0]["error"])
+        self.assertEqual(
+            [p["page_number"] for p in results[0]["pages"]],
+            [1, 2, 3, 4]
+        )
+
+    @patch('pdf_extractor.count_pages')
+    def test_extract_pdfs_reports_errors_per_file(self, mock_count):
+        """Verify an unreadable file is reported without failing the batch."""
+        mock_count.side_effect = Exception("broken pdf")
+
+        from pdf_extractor import extract_pdfs
+        results = extract_pdfs(["broken.pdf"], max_workers=1)
+
+        self.assertEqual(results[0]["pages"], [])
+        self.assertIn("broken pdf", results[0]["error"])
+
+    @patch('pdf_extractor.extract_page_range')
+    @patch('pdf_extractor.count_pages')
+    def test_iter_extract_pdfs_yields_each_file_once(self, mock_count, mock_extract):
+        """Verify every file is yielded exactly once with all of its pages."""
+        mock_count.side_effect = lambda source: {"a.pdf": 3, "b.pdf": 1}[source]
+        mock_extract.side_effect = lambda source, pages: [
+            {"text": f"{source} {n}", "page_number": n} for n in pages
+        ]
+
+        from pdf_extractor import iter_extract_pdfs
+        yielded = list(iter_extract_pdfs(["a.pdf", "b.pdf"], max_workers=1, pages_per_shard=2))
+
+        self.assertEqual(sorted(idx for idx, _ in yielded), [0, 1])
+        pages_by_file = {idx: [p["page_number"] for p in r["pages"]] for idx, r in yielded}
+        self.assertEqual(pages_by_file, {0: [1, 2, 3], 1: [1]})
+
+
+if __name__ == "__main__":
+    unittest.main()
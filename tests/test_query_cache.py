@@ -0,0 +1,62 @@
+"""Unit tests for query_cache module."""
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestQueryCache(unittest.TestCase):
+    """Test QueryCache LRU eviction, expiry and statistics."""
+
+    def test_get_returns_put_value(self):
+        """Verify a stored value is returned and counted as a hit."""
+        from query_cache import QueryCache
+        cache = QueryCache(max_size=2, ttl=60)
+        cache.put(("q", 5), ["result"])
+
+        self.assertEqual(cache.get(("q", 5)), ["result"])
+        self.assertIsNone(cache.get(("q", 10)))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_put_evicts_least_recently_used(self):
+        """Verify the least recently used entry is evicted once full."""
+        from query_cache import QueryCache
+        cache = QueryCache(max_size=2, ttl=60)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    @patch('query_cache.time.monotonic')
+    def test_get_expires_after_ttl(self, mock_monotonic):
+        """Verify entries older than the TTL are treated as misses."""
+        from query_cache import QueryCache
+        cache = QueryCache(max_size=2, ttl=300)
+        mock_monotonic.return_value = 1000.0
+        cache.put("a", 1)
+
+        mock_monotonic.return_value = 1299.0
+        self.assertEqual(cache.get("a"), 1)
+        mock_monotonic.return_value = 1300.0
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate_empties_cache(self):
+        """Verify invalidate drops every entry."""
+        from query_cache import QueryCache
+        cache = QueryCache(max_size=2, ttl=60)
+        cache.put("a", 1)
+        cache.invalidate()
+
+        self.assertIsNone(cache.get("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+"""Unit tests for reranker module."""
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def build_layered_model(num_layers):
+    """Build a tiny ONNX graph: each encoder layer adds 1, the head multiplies by 2."""
+    import onnx
+    from onnx import helper, TensorProto
+
+    nodes = []
+    previous = "hidden_states"
+    for i in range(num_layers):
+        output = f"/encoder/layer.{i}/output/Add_output_0"
+        nodes.append(helper.make_node(
+            "Add", [previous, "one"], [output], name=f"/encoder/layer.{i}/output/Add"
+        ))
+        previous = output
+    nodes.append(helper.make_node("Mul", [previous, "two"], ["logits"], name="/classifier/Mul"))
+
+    graph = helper.make_graph(
+        nodes,
+        "layered",
+        [helper.make_tensor_value_info("hidden_states", TensorProto.FLOAT, [1])],
+        [helper.make_tensor_value_info("logits", TensorProto.FLOAT, [1])],
+        initializer=[
+            helper.make_tensor("one", TensorProto.FLOAT, [1], [1.0]),
+            helper.make_tensor("two", TensorProto.FLOAT, [1], [2.0])
+        ]
+    )
+    return helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8)
+
+
+class TestFindLayerOutputs(unittest.TestCase):
+    """Test encoder layer boundary detection."""
+
+    def test_find_layer_outputs(self):
+        """Verify every layer maps to the tensor it hands to the next stage."""
+        from reranker import find_layer_outputs
+
+        outputs = find_layer_outputs(build_layered_model(3).graph)
+
+        self.assertEqual(outputs, {
+            i: f"/encoder/layer.{i}/output/Add_output_0" for i in range(3)
+        })
+
+
+class TestTruncateEncoderLayers(unittest.TestCase):
+    """Test ONNX layer truncation."""
+
+    def test_truncated_model_runs_first_layers_only(self):
+        """Verify the truncated graph applies the head to the kept layers' output."""
+        import onnx
+        import onnxruntime as ort
+        from reranker import truncate_encoder_layers
+
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, "model.onnx")
+            dst = os.path.join(tmp, "truncated.onnx")
+            onnx.save(build_layered_model(4), src)
+
+            self.assertTrue(truncate_encoder_layers(src, dst, keep_layers=2))
+            session = ort.InferenceSession(dst)
+            logits = session.run(None, {"hidden_states": np.array([0.0], dtype=np.float32)})[0]
+            node_names = [node.name for node in onnx.load(dst).graph.node]
+
+        # (0 + 1 + 1) * 2
+        self.assertEqual(logits.tolist(), [4.0])
+        self.assertNotIn("/encoder/layer.3/output/Add", node_names)
+
+    def test_truncate_noop_when_keeping_all_layers(self):
+        """Verify asking for at least the full depth leaves the model alone."""
+        import onnx
+        from reranker import truncate_encoder_layers
+
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, "model.onnx")
+            dst = os.path.join(tmp, "truncated.onnx")
+            onnx.save(build_layered_model(2), src)
+
+            self.assertFalse(truncate_encoder_layers(src, dst, keep_layers=2))
+            self.assertFalse(os.path.exists(dst))
+
+
+def build_top_k_ranker(logits):
+    """Build a TopKRanker around a fake tokenizer and a session returning fixed logits."""
+    from reranker import TopKRanker
+
+    ranker = TopKRanker.__new__(TopKRanker)
+    ranker.llm_model = None
+    ranker.logger = MagicMock()
+    ranker.tokenizer = MagicMock()
+    ranker.tokenizer.encode_batch.side_effect = lambda pairs: [
+        MagicMock(ids=[1, 2], type_ids=[0, 0], attention_mask=[1, 1]) for _ in pairs
+    ]
+    ranker.session = MagicMock()
+    ranker.session.run.return_value = [np.array(logits, dtype=np.float32)]
+    return ranker
+
+
+class TestTopKRanker(unittest.TestCase):
+    """Test partial top-k reranking."""
+
+    def test_rerank_top_k_matches_full_rerank(self):
+        """Verify the top_k passages and scores match FlashRank's full sort."""
+        from flashrank import RerankRequest
+
+        logits = [[0.3], [2.0], [-1.0], [1.2], [0.9]]
+        passages = [{"id": i, "text": f"text {i}"} for i in range(len(logits))]
+
+        top = build_top_k_ranker(logits).rerank(
+            RerankRequest(query="q", passages=[dict(p) for p in passages]), top_k=2
+        )
+        full = build_top_k_ranker(logits).rerank(
+            RerankRequest(query="q", passages=[dict(p) for p in passages])
+        )
+
+        self.assertEqual([p["id"] for p in top], [1, 3])
+        self.assertEqual([p["id"] for p in top], [p["id"] for p in full[:2]])
+        np.testing.assert_allclose([p["score"] for p in top], [p["score"] for p in full[:2]], rtol=1e-6)
+
+    def test_rerank_top_k_two_class_logits(self):
+        """Verify two-class models are ranked by their softmax relevance probability."""
+        from flashrank import RerankRequest
+
+        logits = [[2.0, 0.0], [0.0, 1.0], [1.0, 1.5]]
+        passages = [{"id": i, "text": f"text {i}"} for i in range(len(logits))]
+
+        top = build_top_k_ranker(logits).rerank(RerankRequest(query="q", passages=passages), top_k=1)
+
+        self.assertEqual(top[0]["id"], 1)
+        self.assertAlmostEqual(float(top[0]["score"]), 1 / (1 + np.exp(-1.0)), places=6)
+
+
+class TestRerankerTruncationWiring(unittest.TestCase):
+    """Test RetrievalEngine applies truncation when configured."""
+
+    @patch('retrieval.RERANKER_TRUNCATE_LAYER', 6)
+    @patch('retrieval.apply_layer_truncation')
+    @patch('retrieval.get_vector_store')
+    @patch('retrieval.TopKRanker')
+    def test_reranker_truncated_when_configured(self, mock_ranker_class, mock_get_vs, mock_truncate):
+        """Verify the loaded Ranker is truncated to RERANKER_TRUNCATE_LAYER layers."""
+        mock_get_vs.return_value = MagicMock()
+
+        from retrieval import RetrievalEngine
+        engine = RetrievalEngine()
+        _ = engine.reranker
+
+        self.assertEqual(mock_truncate.call_args[0][2], 6)
+
+    @patch('retrieval.RERANKER_TRUNCATE_LAYER', 6)
+    @patch('retrieval.apply_layer_truncation')
+    @patch('retrieval.get_vector_store')
+    @patch('retrieval.TopKRanker')
+    def test_reranker_falls_back_when_truncation_fails(self, mock_ranker_class, mock_get_vs, mock_truncate):
+        """Verify a truncation failure keeps the full reranker usable."""
+        mock_get_vs.return_value = MagicMock()
+        mock_truncate.side_effect = ValueError("unexpected graph")
+
+        from retrieval import RetrievalEngine
+        engine = RetrievalEngine()
+
+        self.assertIs(engine.reranker, mock_ranker_class.return_value)
+
+
+if __name__ == "__main__":
+    unittest.main()
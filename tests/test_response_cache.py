@@ -0,0 +1,76 @@
+"""Unit tests for response_cache module."""
+import unittest
+import sys
+import os
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestSemanticResponseCache(unittest.TestCase):
+    """Test SemanticResponseCache lookup and eviction."""
+
+    def test_lookup_empty_cache_returns_none(self):
+        """Verify lookup on an empty cache misses."""
+        from response_cache import SemanticResponseCache
+        cache = SemanticResponseCache(threshold=0.97)
+
+        self.assertIsNone(cache.lookup([1.0, 0.0]))
+
+    def test_lookup_returns_similar_answer(self):
+        """Verify a near-duplicate query returns the cached answer and sources."""
+        from response_cache import SemanticResponseCache
+        cache = SemanticResponseCache(threshold=0.97)
+        sources = [{"source": "kdv.pdf"}]
+        cache.add([1.0, 0.0], "KDV oranı %20", sources)
+
+        result = cache.lookup([0.99, 0.05])
+
+        self.assertEqual(result, ("KDV oranı %20", sources))
+
+    def test_lookup_below_threshold_misses(self):
+        """Verify a dissimilar query does not hit the cache."""
+        from response_cache import SemanticResponseCache
+        cache = SemanticResponseCache(threshold=0.97)
+        cache.add([1.0, 0.0], "answer", [])
+
+        self.assertIsNone(cache.lookup([0.7, 0.7]))
+
+    def test_lookup_respects_scope(self):
+        """Verify answers are only reused within the same scope."""
+        from response_cache import SemanticResponseCache
+        cache = SemanticResponseCache(threshold=0.97)
+        cache.add([1.0, 0.0], "llama-70b answer", [], scope=("llama-3.3-70b-versatile", True))
+
+        self.assertIsNone(cache.lookup([1.0, 0.0], scope=("llama-3.1-8b-instant", True)))
+        self.assertEqual(
+            cache.lookup([1.0, 0.0], scope=("llama-3.3-70b-versatile", True))[0],
+            "llama-70b answer"
+        )
+
+    def test_add_evicts_oldest(self):
+        """Verify the oldest entry is evicted when the cache is full."""
+        from response_cache import SemanticResponseCache
+        cache = SemanticResponseCache(threshold=0.97, max_entries=2)
+        cache.add(np.array([1.0, 0.0, 0.0]), "first", [])
+        cache.add(np.array([0.0, 1.0, 0.0]), "second", [])
+        cache.add(np.array([0.0, 0.0, 1.0]), "third", [])
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.lookup([1.0, 0.0, 0.0]))
+        self.assertEqual(cache.lookup([0.0, 0.0, 1.0])[0], "third")
+
+    def test_clear_empties_cache(self):
+        """Verify clear removes all cached answers."""
+        from response_cache import SemanticResponseCache
+        cache = SemanticResponseCache()
+        cache.add([1.0, 0.0], "answer", [])
+
+        cache.clear()
+
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.lookup([1.0, 0.0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
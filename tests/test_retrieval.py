@@ -1,37 +1,81 @@
 """Unit tests for retrieval module."""
 import unittest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, patch
+from types import SimpleNamespace
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from retrieval import RetrievalEngine, RetrievalResult
 
-class TestRetrievalEngineInit(unittest.TestCase):
+
+class RetrievalTestCase(unittest.TestCase):
+    """Patch the vector store and FlashRank for every test."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.mock_vs = Mock()
+        self.mock_ranker = Mock()
+        self.mock_get_vs = Mock(return_value=self.mock_vs)
+        self.mock_ranker_class = Mock(return_value=self.mock_ranker)
+
+        patcher = patch.multiple(
+            'retrieval',
+            get_vector_store=self.mock_get_vs,
+            TopKRanker=self.mock_ranker_class
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+def make_store():
+    """Build a real VectorStore around a mocked Qdrant client and embedder."""
+    from vector_store import VectorStore
+
+    client = Mock()
+    client.collection_exists.return_value = True
+    client.get_collection.return_value = SimpleNamespace(payload_schema={})
+    embedder = Mock()
+    embedder.embed_queries.side_effect = lambda queries: [[0.1, 0.2] for _ in queries]
+    with patch.multiple(
+        'vector_store',
+        QdrantClient=Mock(return_value=client),
+        QdrantVectorStore=Mock(),
+        get_embedder=Mock(return_value=embedder)
+    ):
+        store = VectorStore(use_memory=True)
+    store._vector_store.content_payload_key = "page_content"
+    store._vector_store.metadata_payload_key = "metadata"
+    return store
+
+
+def make_response(*texts):
+    """Build a query_batch_points response with one hit per text."""
+    return SimpleNamespace(points=[
+        SimpleNamespace(id=text, score=0.9, payload={"page_content": text, "metadata": {"source": "doc.pdf"}})
+        for text in texts
+    ])
+
+
+class TestRetrievalEngineInit(RetrievalTestCase):
     """Test RetrievalEngine initialization."""
 
-    @patch('retrieval.get_vector_store')
-    def test_init_creates_vector_store(self, mock_get_vs):
+    def test_init_creates_vector_store(self):
         """Verify RetrievalEngine initializes with vector store."""
-        mock_vs = MagicMock()
-        mock_get_vs.return_value = mock_vs
+        mock_vs = Mock()
+        self.mock_get_vs.return_value = mock_vs
         
-        from retrieval import RetrievalEngine
         engine = RetrievalEngine()
         
         self.assertEqual(engine.vector_store, mock_vs)
         self.assertIsNone(engine._reranker)
 
-    @patch('retrieval.get_vector_store')
-    @patch('retrieval.Ranker')
-    def test_reranker_lazy_loading(self, mock_ranker_class, mock_get_vs):
+    def test_reranker_lazy_loading(self):
         """Verify reranker is lazy loaded on first access."""
-        mock_vs = MagicMock()
-        mock_get_vs.return_value = mock_vs
-        mock_ranker = MagicMock()
-        mock_ranker_class.return_value = mock_ranker
+        mock_vs = Mock()
+        self.mock_get_vs.return_value = mock_vs
         
-        from retrieval import RetrievalEngine
         engine = RetrievalEngine()
         
         # Reranker should not be loaded yet
@@ -41,15 +85,49 @@ class TestRetrievalEngineInit(unittest.TestCase):
         _ = engine.reranker
         
         # Now reranker should be loaded
-        mock_ranker_class.assert_called_once()
+        self.mock_ranker_class.assert_called_once()
+
+
+    def test_reranker_loads_during_search(self):
+        """Verify FlashRank is loaded concurrently with the first vector search."""
+        import threading
+        loaded = threading.Event()
+        seen_during_search = []
 
+        def load_ranker(**kwargs):
+            loaded.set()
+            ranker = Mock()
+            ranker.rerank.side_effect = lambda request, top_k=None: [
+                {**p, "score": 0.5} for p in request.passages
+            ]
+            return ranker
+        self.mock_ranker_class.side_effect = load_ranker
+
+        def search(query, top_k):
+            seen_during_search.append(loaded.wait(timeout=5))
+            return [
+                {"id": str(i), "score": 0.9, "text": "t", "source": "d.pdf",
+                 "chunk_index": i, "page_number": 1, "metadata": {}}
+                for i in range(2)
+            ]
+        mock_vs = Mock()
+        mock_vs.search.side_effect = search
+        self.mock_get_vs.return_value = mock_vs
+
+        engine = RetrievalEngine()
+        results, debug_info = engine.retrieve("q", use_reranking=True, top_k_final=1)
 
-class TestRetrievalEngineRetrieve(unittest.TestCase):
+        self.assertEqual(seen_during_search, [True])
+        self.assertEqual(debug_info["final_method"], "reranked")
+        self.mock_ranker_class.assert_called_once()
+
+
+class TestRetrievalEngineRetrieve(RetrievalTestCase):
     """Test RetrievalEngine retrieve method."""
 
     def setUp(self):
         """Set up test fixtures."""
-        self.mock_vs = MagicMock()
+        super().setUp()
         self.mock_vs.search.return_value = [
             {
                 "id": "1",
@@ -71,12 +149,8 @@ class TestRetrievalEngineRetrieve(unittest.TestCase):
             }
         ]
 
-    @patch('retrieval.get_vector_store')
-    def test_retrieve_without_reranking(self, mock_get_vs):
+    def test_retrieve_without_reranking(self):
         """Verify retrieve works without reranking."""
-        mock_get_vs.return_value = self.mock_vs
-        
-        from retrieval import RetrievalEngine
         engine = RetrievalEngine()
         
         results, debug_info = engine.retrieve(
@@ -88,24 +162,16 @@ class TestRetrievalEngineRetrieve(unittest.TestCase):
         self.assertEqual(len(results), 2)
         self.assertEqual(debug_info["final_method"], "vector_only")
 
-    @patch('retrieval.get_vector_store')
-    @patch('retrieval.Ranker')
-    def test_retrieve_with_reranking(self, mock_ranker_class, mock_get_vs):
+    def test_retrieve_with_reranking(self):
         """Verify retrieve works with reranking."""
-        mock_get_vs.return_value = self.mock_vs
-        
-        mock_ranker = MagicMock()
-        mock_ranker.rerank.return_value = [
+        self.mock_ranker.rerank.return_value = [
             {
                 "id": 0,
                 "score": 0.95,
-                "text": "Test text 1",
-                "meta": self.mock_vs.search.return_value[0]
+                "text": "Test text 1"
             }
         ]
-        mock_ranker_class.return_value = mock_ranker
         
-        from retrieval import RetrievalEngine
         engine = RetrievalEngine()
         
         results, debug_info = engine.retrieve(
@@ -115,15 +181,115 @@ class TestRetrievalEngineRetrieve(unittest.TestCase):
         )
         
         self.assertEqual(debug_info["final_method"], "reranked")
+        passages = self.mock_ranker.rerank.call_args[0][0].passages
+        self.assertEqual(passages[0], {"id": 0, "text": "Test text 1"})
+
+    def test_retrieve_skips_reranker_for_few_results(self):
+        """Verify FlashRank is skipped when there are no more candidates than top_k_final."""
+        engine = RetrievalEngine()
+
+        results, debug_info = engine.retrieve(query="test query", top_k_final=2)
+
+        self.assertEqual(debug_info["final_method"], "vector_only_small")
+        self.assertEqual([r.id for r in results], ["1", "2"])
+        self.mock_ranker_class.return_value.rerank.assert_not_called()
+
+    def test_retrieve_skips_reranker_for_clear_margin(self):
+        """Verify FlashRank is skipped when the top vector score leads by more than the margin."""
+        self.mock_vs.search.return_value[1]["score"] = 0.5
+        self.mock_vs.search.return_value.append({**self.mock_vs.search.return_value[1], "id": "3"})
+
+        engine = RetrievalEngine()
+
+        results, debug_info = engine.retrieve(query="test query", top_k_final=2)
+
+        self.assertEqual(debug_info["final_method"], "vector_only_confident")
+        self.assertEqual([r.id for r in results], ["1", "2"])
+        self.mock_ranker_class.return_value.rerank.assert_not_called()
+
+    def test_retrieve_reuses_rerank_request_per_thread(self):
+        """Verify one RerankRequest per thread is refilled for each query."""
+        seen = []
+        def rerank(request, top_k=None):
+            seen.append((request, request.query, list(request.passages)))
+            return [{**request.passages[0], "score": 0.5}]
+        self.mock_ranker.rerank.side_effect = rerank
 
-    @patch('retrieval.get_vector_store')
-    def test_retrieve_empty_results(self, mock_get_vs):
+        engine = RetrievalEngine()
+
+        engine.retrieve(query="first query", top_k_final=1)
+        self.mock_vs.search.return_value = self.mock_vs.search.return_value[::-1]
+        engine.retrieve(query="second query", top_k_final=1)
+
+        self.assertIs(seen[0][0], seen[1][0])
+        self.assertEqual(seen[1][1], "second query")
+        self.assertEqual(seen[1][2], [{"id": 0, "text": "Test text 2"}, {"id": 1, "text": "Test text 1"}])
+
+    def test_retrieve_keeps_reranker_order_and_truncates(self):
+        """Verify the reranker is asked for top_k_final results and its order is kept."""
+        self.mock_ranker.rerank.return_value = [{"id": 1, "score": 0.97, "text": "Test text 2"}]
+
+        engine = RetrievalEngine()
+
+        results, debug_info = engine.retrieve(
+            query="test query",
+            use_reranking=True,
+            top_k_final=1
+        )
+
+        self.assertEqual(self.mock_ranker.rerank.call_args.kwargs["top_k"], 1)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0].text, "Test text 2")
+        self.assertEqual(results[0].original_score, 0.8)
+
+    def test_retrieve_returns_retrieval_results(self):
+        """Verify reranked results are RetrievalResult objects carrying both scores."""
+        self.mock_ranker.rerank.return_value = [{"id": 0, "score": 0.95, "text": "Test text 1"}]
+
+        from dataclasses import asdict
+        engine = RetrievalEngine()
+
+        results, _ = engine.retrieve(query="test query", top_k_final=1)
+
+        self.assertIsInstance(results[0], RetrievalResult)
+        self.assertEqual(asdict(results[0]), {
+            "id": "1",
+            "score": 0.95,
+            "original_score": 0.9,
+            "text": "Test text 1",
+            "source": "doc1.pdf",
+            "chunk_index": 0,
+            "page_number": 1,
+            "metadata": {}
+        })
+
+    def test_retrieve_recall_mode_sets_candidate_count(self):
+        """Verify recall_mode selects the number of first-stage candidates."""
+        from config import RECALL_MODE_TOP_K
+        engine = RetrievalEngine()
+
+        results, debug_info = engine.retrieve(
+            query="test query",
+            use_reranking=False,
+            recall_mode="fast"
+        )
+
+        self.mock_vs.search.assert_called_with(query="test query", top_k=RECALL_MODE_TOP_K["fast"])
+        self.assertEqual(debug_info["top_k_initial"], RECALL_MODE_TOP_K["fast"])
+
+    def test_retrieve_unknown_recall_mode_raises(self):
+        """Verify an unknown recall_mode is rejected."""
+        engine = RetrievalEngine()
+
+        with self.assertRaises(ValueError):
+            engine.retrieve(query="test query", recall_mode="exhaustive")
+
+    def test_retrieve_empty_results(self):
         """Verify retrieve handles empty results."""
-        mock_vs = MagicMock()
+        mock_vs = Mock()
         mock_vs.search.return_value = []
-        mock_get_vs.return_value = mock_vs
+        self.mock_get_vs.return_value = mock_vs
         
-        from retrieval import RetrievalEngine
         engine = RetrievalEngine()
         
         results, debug_info = engine.retrieve(
@@ -134,14 +300,12 @@ class TestRetrievalEngineRetrieve(unittest.TestCase):
         self.assertEqual(len(results), 0)
         self.assertEqual(debug_info["final_method"], "vector_only")
 
-    @patch('retrieval.get_vector_store')
-    def test_retrieve_handles_exception(self, mock_get_vs):
+    def test_retrieve_handles_exception(self):
         """Verify retrieve handles exceptions gracefully."""
-        mock_vs = MagicMock()
+        mock_vs = Mock()
         mock_vs.search.side_effect = Exception("Search error")
-        mock_get_vs.return_value = mock_vs
+        self.mock_get_vs.return_value = mock_vs
         
-        from retrieval import RetrievalEngine
         engine = RetrievalEngine()
         
         results, debug_info = engine.retrieve(query="test")
@@ -149,12 +313,8 @@ class TestRetrievalEngineRetrieve(unittest.TestCase):
         self.assertEqual(results, [])
         self.assertIn("error", debug_info)
 
-    @patch('retrieval.get_vector_store')
-    def test_retrieve_debug_info_contains_query(self, mock_get_vs):
+    def test_retrieve_debug_info_contains_query(self):
         """Verify debug info contains query information."""
-        mock_get_vs.return_value = self.mock_vs
-        
-        from retrieval import RetrievalEngine
         engine = RetrievalEngine()
         
         results, debug_info = engine.retrieve(
@@ -165,35 +325,221 @@ class TestRetrievalEngineRetrieve(unittest.TestCase):
         self.assertEqual(debug_info["query"], "my test query")
 
 
-class TestRetrievalEngineBuildContext(unittest.TestCase):
+class TestRetrievalEngineBatch(RetrievalTestCase):
+    """Test RetrievalEngine batched retrieval."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        super().setUp()
+        self.mock_vs.search.side_effect = lambda query, top_k: [
+            {
+                "id": query,
+                "score": 0.9,
+                "text": f"text for {query}",
+                "source": "doc.pdf",
+                "chunk_index": 0,
+                "page_number": 1,
+                "metadata": {}
+            },
+            {
+                "id": f"{query}-2",
+                "score": 0.85,
+                "text": f"second text for {query}",
+                "source": "doc.pdf",
+                "chunk_index": 1,
+                "page_number": 1,
+                "metadata": {}
+            }
+        ]
+        self.mock_vs.search_batch.side_effect = lambda queries, top_k: [
+            self.mock_vs.search(query=query, top_k=top_k) for query in queries
+        ]
+
+    def test_retrieve_batch_returns_results_per_query(self):
+        """Verify retrieve_batch returns one (results, debug_info) pair per query in order."""
+        self.mock_ranker.rerank.side_effect = lambda request, top_k=None: [
+            {**p, "score": 0.5} for p in request.passages
+        ]
+
+        engine = RetrievalEngine()
+
+        outputs = engine.retrieve_batch(["q1", "q2"], top_k_final=1)
+
+        self.assertEqual([results[0].text for results, _ in outputs], ["text for q1", "text for q2"])
+        self.assertEqual([debug["query"] for _, debug in outputs], ["q1", "q2"])
+        self.assertEqual(self.mock_ranker.rerank.call_count, 2)
+        self.mock_vs.search_batch.assert_called_once()
+
+    def test_retrieve_batch_reports_search_errors(self):
+        """Verify a failing Qdrant batch search is reported on every uncached query and not cached."""
+        store = make_store()
+        store._client.query_batch_points.side_effect = [
+            [make_response("cached hit")],
+            Exception("Search error"),
+            [make_response("q1 hit"), make_response("q2 hit")]
+        ]
+        self.mock_get_vs.return_value = store
+        engine = RetrievalEngine()
+        engine.retrieve("cached", use_reranking=False)
+
+        outputs = engine.retrieve_batch(["cached", "q1", "q2"], use_reranking=False)
+        retried = engine.retrieve_batch(["q1", "q2"], use_reranking=False)
+
+        self.assertNotIn("error", outputs[0][1])
+        self.assertEqual([output[0] for output in outputs[1:]], [[], []])
+        self.assertIn("error", outputs[1][1])
+        self.assertIn("error", outputs[2][1])
+        self.assertEqual([results[0].text for results, _ in retried], ["q1 hit", "q2 hit"])
+
+    def test_retrieve_many_returns_future(self):
+        """Verify retrieve_many runs retrieve_batch on the worker pool."""
+        engine = RetrievalEngine(max_concurrency=2)
+
+        outputs = engine.retrieve_many(["q1", "q2"], use_reranking=False).result(timeout=5)
+
+        self.assertEqual([results[0].id for results, _ in outputs], ["q1", "q2"])
+
+    def test_submit_resolves_future(self):
+        """Verify queued queries are answered through futures."""
+        engine = RetrievalEngine()
+
+        futures = [engine.submit(q, use_reranking=False) for q in ["q1", "q2", "q3"]]
+        outputs = [future.result(timeout=5) for future in futures]
+
+        self.assertEqual([results[0].id for results, _ in outputs], ["q1", "q2", "q3"])
+
+    def test_retrieve_async_returns_future(self):
+        """Verify retrieve_async runs retrieve on the worker pool."""
+        engine = RetrievalEngine(max_concurrency=2)
+
+        future = engine.retrieve_async("q1", use_reranking=False)
+        results, debug_info = future.result(timeout=5)
+
+        self.assertEqual(results[0].id, "q1")
+        self.assertEqual(debug_info["final_method"], "vector_only")
+
+
+class TestRetrievalEngineCache(RetrievalTestCase):
+    """Test RetrievalEngine LRU result cache."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        super().setUp()
+        self.mock_vs.search.side_effect = lambda query, top_k: [
+            {
+                "id": query,
+                "score": 0.9,
+                "text": f"text for {query}",
+                "source": "doc.pdf",
+                "chunk_index": 0,
+                "page_number": 1,
+                "metadata": {}
+            }
+        ]
+
+    def test_repeated_query_hits_cache(self):
+        """Verify an identical query is served without searching again."""
+        engine = RetrievalEngine()
+
+        first, _ = engine.retrieve("q1", use_reranking=False)
+        second, debug_info = engine.retrieve("q1", use_reranking=False)
+
+        self.assertEqual(first, second)
+        self.assertTrue(debug_info["cache_hit"])
+        self.assertEqual(self.mock_vs.search.call_count, 1)
+
+    def test_different_options_miss_cache(self):
+        """Verify the cache key includes retrieval options."""
+        engine = RetrievalEngine()
+
+        engine.retrieve("q1", use_reranking=False, top_k_final=1)
+        engine.retrieve("q1", use_reranking=False, top_k_final=2)
+
+        self.assertEqual(self.mock_vs.search.call_count, 2)
+
+    def test_errors_are_not_cached(self):
+        """Verify failed retrievals are retried instead of served from cache."""
+        self.mock_vs.search.side_effect = Exception("Search error")
+
+        engine = RetrievalEngine()
+
+        engine.retrieve("q1")
+        engine.retrieve("q1")
+
+        self.assertEqual(self.mock_vs.search.call_count, 2)
+
+    def test_store_errors_are_not_cached(self):
+        """Verify a failed search in the real store is reported and retried once Qdrant recovers."""
+        store = make_store()
+        store._client.query_batch_points.side_effect = [
+            Exception("Search error"),
+            [make_response("a", "b")]
+        ]
+        self.mock_get_vs.return_value = store
+
+        engine = RetrievalEngine()
+
+        failed, failed_debug = engine.retrieve("q1", use_reranking=False)
+        results, debug_info = engine.retrieve("q1", use_reranking=False)
+
+        self.assertEqual(failed, [])
+        self.assertIn("error", failed_debug)
+        self.assertEqual([r.text for r in results], ["a", "b"])
+        self.assertNotIn("cache_hit", debug_info)
+
+    def test_store_writes_miss_cache(self):
+        """Verify results cached before a store write are not served after it."""
+        self.mock_vs.generation = 0
+        engine = RetrievalEngine()
+
+        engine.retrieve("q1", use_reranking=False)
+        self.mock_vs.generation = 1
+        _, debug_info = engine.retrieve("q1", use_reranking=False)
+
+        self.assertNotIn("cache_hit", debug_info)
+        self.assertEqual(self.mock_vs.search.call_count, 2)
+
+    def test_cache_evicts_least_recently_used(self):
+        """Verify the least recently used entry is evicted beyond cache_size."""
+        engine = RetrievalEngine(cache_size=2)
+
+        engine.retrieve("q1", use_reranking=False)
+        engine.retrieve("q2", use_reranking=False)
+        engine.retrieve("q1", use_reranking=False)
+        engine.retrieve("q3", use_reranking=False)
+        engine.retrieve("q2", use_reranking=False)
+
+        searched = [c.kwargs["query"] for c in self.mock_vs.search.call_args_list]
+        self.assertEqual(searched, ["q1", "q2", "q3", "q2"])
+
+    def test_clear_cache(self):
+        """Verify clear_cache forces a fresh search."""
+        engine = RetrievalEngine()
+
+        engine.retrieve("q1", use_reranking=False)
+        engine.clear_cache()
+        engine.retrieve("q1", use_reranking=False)
+
+        self.assertEqual(self.mock_vs.search.call_count, 2)
+
+
+class TestRetrievalEngineBuildContext(RetrievalTestCase):
     """Test RetrievalEngine build_context method."""
 
-    @patch('retrieval.get_vector_store')
-    def test_build_context_empty_results(self, mock_get_vs):
+    def test_build_context_empty_results(self):
         """Verify build_context handles empty results."""
-        mock_get_vs.return_value = MagicMock()
-        
-        from retrieval import RetrievalEngine
         engine = RetrievalEngine()
         
         context = engine.build_context([])
         
         self.assertIn("No context found", context)
 
-    @patch('retrieval.get_vector_store')
-    def test_build_context_with_results(self, mock_get_vs):
+    def test_build_context_with_results(self):
         """Verify build_context formats results correctly."""
-        mock_get_vs.return_value = MagicMock()
-        
-        from retrieval import RetrievalEngine
         engine = RetrievalEngine()
         
         results = [
-            {
-                "source": "test.pdf",
-                "page_number": 5,
-                "text": "Test content"
-            }
+            RetrievalResult("1", 0.9, 0.9, "Test content", "test.pdf", 0, 5, {})
         ]
         
         context = engine.build_context(results)
@@ -202,20 +548,12 @@ class TestRetrievalEngineBuildContext(unittest.TestCase):
         self.assertIn("Test content", context)
         self.assertIn("5", context)
 
-    @patch('retrieval.get_vector_store')
-    def test_build_context_without_page_number(self, mock_get_vs):
+    def test_build_context_without_page_number(self):
         """Verify build_context handles missing page number."""
-        mock_get_vs.return_value = MagicMock()
-        
-        from retrieval import RetrievalEngine
         engine = RetrievalEngine()
         
         results = [
-            {
-                "source": "test.pdf",
-                "page_number": -1,
-                "text": "Test content"
-            }
+            RetrievalResult("1", 0.9, 0.9, "Test content", "test.pdf", 0, -1, {})
         ]
         
         context = engine.build_context(results)
@@ -224,25 +562,15 @@ class TestRetrievalEngineBuildContext(unittest.TestCase):
         self.assertNotIn("Sayfa -1", context)
 
 
-class TestRetrievalEngineFormatSources(unittest.TestCase):
+class TestRetrievalEngineFormatSources(RetrievalTestCase):
     """Test RetrievalEngine format_sources method."""
 
-    @patch('retrieval.get_vector_store')
-    def test_format_sources(self, mock_get_vs):
+    def test_format_sources(self):
         """Verify format_sources returns correctly structured data."""
-        mock_get_vs.return_value = MagicMock()
-        
-        from retrieval import RetrievalEngine
         engine = RetrievalEngine()
         
         results = [
-            {
-                "source": "doc.pdf",
-                "page_number": 3,
-                "text": "Content",
-                "score": 0.9,
-                "original_score": 0.85
-            }
+            RetrievalResult("1", 0.9, 0.85, "Content", "doc.pdf", 0, 3, {})
         ]
         
         sources = engine.format_sources(results)
@@ -253,12 +581,25 @@ class TestRetrievalEngineFormatSources(unittest.TestCase):
         self.assertEqual(sources[0]["page_number"], 3)
         self.assertEqual(sources[0]["score"], 0.9)
 
-    @patch('retrieval.get_vector_store')
-    def test_format_sources_empty(self, mock_get_vs):
+    def test_format_sources_vector_only_results(self):
+        """Verify vector-only results report the vector score as both scores."""
+        mock_vs = Mock()
+        mock_vs.search.return_value = [{
+            "id": "1", "score": 0.7, "text": "Content", "source": "doc.pdf",
+            "chunk_index": 0, "metadata": {}
+        }]
+        self.mock_get_vs.return_value = mock_vs
+
+        engine = RetrievalEngine()
+
+        results, _ = engine.retrieve(query="test query", use_reranking=False)
+        sources = engine.format_sources(results)
+
+        self.assertEqual(sources[0]["original_score"], 0.7)
+        self.assertEqual(sources[0]["page_number"], -1)
+
+    def test_format_sources_empty(self):
         """Verify format_sources handles empty results."""
-        mock_get_vs.return_value = MagicMock()
-        
-        from retrieval import RetrievalEngine
         engine = RetrievalEngine()
         
         sources = engine.format_sources([])
@@ -276,7 +617,7 @@ class TestGetRetrievalEngine(unittest.TestCase):
         import retrieval
         retrieval._retrieval_engine_instance = None
         
-        mock_instance = MagicMock()
+        mock_instance = Mock()
         mock_class.return_value = mock_instance
         
         result1 = retrieval.get_retrieval_engine()
@@ -284,6 +625,32 @@ class TestGetRetrievalEngine(unittest.TestCase):
         
         self.assertEqual(result1, result2)
 
+    @patch('retrieval._retrieval_engine_instance', None)
+    @patch('retrieval.RetrievalEngine')
+    def test_get_retrieval_engine_concurrent_first_calls(self, mock_class):
+        """Verify concurrent first calls construct a single instance."""
+        import threading
+        import time
+        import retrieval
+
+        def slow_init():
+            time.sleep(0.05)
+            return Mock()
+        mock_class.side_effect = slow_init
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(retrieval.get_retrieval_engine()))
+            for _ in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        mock_class.assert_called_once()
+        self.assertTrue(all(r is results[0] for r in results))
+
 
 if __name__ == "__main__":
     unittest.main()
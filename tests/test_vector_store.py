@@ -1,250 +1,466 @@
 """Unit tests for vector_store module."""
 import unittest
-from unittest.mock import Mock, patch, MagicMock
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
 import sys
 import os
+import numpy as np
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from vector_store import VectorStore
 
-class TestVectorStoreInit(unittest.TestCase):
+
+class VectorStoreTestCase(unittest.TestCase):
+    """Patch the Qdrant client, the langchain wrapper and the embedder for every test."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.mock_client = Mock()
+        self.mock_client.collection_exists.return_value = False
+        self.mock_client.get_collection.return_value = SimpleNamespace(payload_schema={})
+        self.mock_vs = Mock()
+        self.mock_vs.content_payload_key = "page_content"
+        self.mock_vs.metadata_payload_key = "metadata"
+        self.mock_embedder = Mock()
+        self.mock_client_class = Mock(return_value=self.mock_client)
+        self.mock_vs_class = Mock(return_value=self.mock_vs)
+
+        patcher = patch.multiple(
+            'vector_store',
+            QdrantClient=self.mock_client_class,
+            QdrantVectorStore=self.mock_vs_class,
+            get_embedder=Mock(return_value=self.mock_embedder)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+def make_response(*hits):
+    """Build a query_batch_points response from (id, score, text, metadata) tuples."""
+    return SimpleNamespace(points=[
+        SimpleNamespace(id=point_id, score=score, payload={"page_content": text, "metadata": metadata})
+        for point_id, score, text, metadata in hits
+    ])
+
+
+_shared_store = None
+
+
+def _make_store():
+    """Build one fully mocked VectorStore and reuse it across read-only tests."""
+    global _shared_store
+    if _shared_store is None:
+        mock_client = Mock()
+        mock_client.collection_exists.return_value = True
+        mock_client.get_collection.return_value = SimpleNamespace(payload_schema={})
+        with patch.multiple(
+            'vector_store',
+            QdrantClient=Mock(return_value=mock_client),
+            QdrantVectorStore=Mock(),
+            get_embedder=Mock()
+        ):
+            _shared_store = VectorStore(use_memory=True)
+        _shared_store._vector_store.content_payload_key = "page_content"
+        _shared_store._vector_store.metadata_payload_key = "metadata"
+    return _shared_store
+
+
+class SharedStoreTestCase(unittest.TestCase):
+    """Run read-only tests against the shared store with its mocks reset."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Bind the shared store and its mocks once per class."""
+        cls.store = _make_store()
+        cls.mock_client = cls.store._client
+        cls.mock_embedder = cls.store._embedder
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.mock_client.reset_mock(return_value=True, side_effect=True)
+        self.mock_embedder.reset_mock(return_value=True, side_effect=True)
+        # Searches populate the cache, so drop it before the next test reads it
+        self.addCleanup(self.store._cache.invalidate)
+
+
+class TestVectorStoreInit(VectorStoreTestCase):
     """Test VectorStore initialization."""
 
-    @patch('vector_store.get_embedder')
-    @patch('vector_store.QdrantVectorStore')
-    @patch('vector_store.QdrantClient')
-    def test_init_memory_mode(self, mock_client_class, mock_vs_class, mock_embedder):
+    def test_init_memory_mode(self):
         """Verify VectorStore initializes in memory mode."""
-        mock_client = MagicMock()
-        mock_client.get_collections.return_value.collections = []
-        mock_client_class.return_value = mock_client
-        
-        from vector_store import VectorStore
         store = VectorStore(use_memory=True)
         
-        mock_client_class.assert_called_with(":memory:")
+        self.mock_client_class.assert_called_with(":memory:")
         self.assertTrue(store.use_memory)
 
-    @patch('vector_store.get_embedder')
-    @patch('vector_store.QdrantVectorStore')
-    @patch('vector_store.QdrantClient')
-    def test_init_disk_mode(self, mock_client_class, mock_vs_class, mock_embedder):
+    def test_init_disk_mode(self):
         """Verify VectorStore initializes in disk mode."""
-        mock_client = MagicMock()
-        mock_client.get_collections.return_value.collections = []
-        mock_client_class.return_value = mock_client
-        
-        from vector_store import VectorStore
         store = VectorStore(path="./test_db", use_memory=False)
         
-        mock_client_class.assert_called_with(path="./test_db")
+        self.mock_client_class.assert_called_with(path="./test_db")
         self.assertFalse(store.use_memory)
 
-    @patch('vector_store.get_embedder')
-    @patch('vector_store.QdrantVectorStore')
-    @patch('vector_store.QdrantClient')
-    def test_collection_created_if_not_exists(self, mock_client_class, mock_vs_class, mock_embedder):
+    def test_collection_created_if_not_exists(self):
         """Verify collection is created when it does not exist."""
-        mock_client = MagicMock()
-        mock_client.get_collections.return_value.collections = []
-        mock_client_class.return_value = mock_client
+        store = VectorStore(collection_name="test_collection", use_memory=True)
         
-        from vector_store import VectorStore
+        self.mock_client.create_collection.assert_called_once()
+
+    def test_server_collection_indexes_filter_fields(self):
+        """Verify source and page_number get payload indexes on a Qdrant server."""
+        from qdrant_client.http.models import PayloadSchemaType
         store = VectorStore(collection_name="test_collection", use_memory=True)
+        store.is_local = False
+        
+        store._ensure_payload_indexes()
         
-        mock_client.create_collection.assert_called_once()
+        indexes = {
+            c.kwargs["field_name"]: c.kwargs["field_schema"]
+            for c in self.mock_client.create_payload_index.call_args_list
+        }
+        self.assertEqual(indexes, {
+            "metadata.source": PayloadSchemaType.KEYWORD,
+            "metadata.page_number": PayloadSchemaType.INTEGER
+        })
 
+    def test_existing_collection_gets_missing_indexes(self):
+        """Verify an existing collection only gets the payload indexes it lacks."""
+        self.mock_client.collection_exists.return_value = True
+        self.mock_client.get_collection.return_value = SimpleNamespace(
+            payload_schema={"metadata.source": Mock()}
+        )
+        
+        store = VectorStore(collection_name="test_collection", use_memory=True)
+        store.is_local = False
+        
+        store._ensure_payload_indexes()
+        
+        self.mock_client.create_collection.assert_not_called()
+        self.assertEqual(
+            [c.kwargs["field_name"] for c in self.mock_client.create_payload_index.call_args_list],
+            ["metadata.page_number"]
+        )
+
+    def test_local_store_skips_payload_indexes(self):
+        """Verify the in-process store never asks for payload indexes."""
+        store = VectorStore(collection_name="test_collection", use_memory=True)
+        
+        self.assertTrue(store.is_local)
+        self.mock_client.create_payload_index.assert_not_called()
+        self.mock_client.get_collection.assert_not_called()
+
+    def test_local_client_skips_payload_indexes(self):
+        """Verify local Qdrant gets no payload indexes and so emits no warning."""
+        import warnings
+        from qdrant_client import QdrantClient
+        self.mock_client_class.return_value = QdrantClient(":memory:")
+        
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            store = VectorStore(collection_name="test_collection", use_memory=True)
+        
+        self.assertEqual(store._client.get_collection("test_collection").payload_schema, {})
+        self.assertEqual([str(w.message) for w in caught if "Payload indexes" in str(w.message)], [])
+
+    def test_existing_collection_not_recreated(self):
+        """Verify an existing collection is reused."""
+        self.mock_client.collection_exists.return_value = True
+        
+        VectorStore(collection_name="test_collection", use_memory=True)
+        
+        self.mock_client.collection_exists.assert_called_with("test_collection")
+        self.mock_client.create_collection.assert_not_called()
+
+    def test_collection_created_with_reduced_precision(self):
+        """Verify new collections store FP16 vectors with INT8 quantization."""
+        from qdrant_client.http.models import Datatype, ScalarType
+        VectorStore(collection_name="test_collection", use_memory=True)
 
-class TestVectorStoreAddDocuments(unittest.TestCase):
+        call_kwargs = self.mock_client.create_collection.call_args[1]
+        self.assertEqual(call_kwargs["vectors_config"].datatype, Datatype.FLOAT16)
+        self.assertEqual(call_kwargs["quantization_config"].scalar.type, ScalarType.INT8)
+
+
+class TestVectorStoreAddDocuments(VectorStoreTestCase):
     """Test VectorStore add_documents method."""
 
-    def setUp(self):
-        """Set up test fixtures."""
-        self.mock_client = MagicMock()
-        self.mock_client.get_collections.return_value.collections = []
-        self.mock_vs = MagicMock()
-        self.mock_embedder = MagicMock()
-
-    @patch('vector_store.get_embedder')
-    @patch('vector_store.QdrantVectorStore')
-    @patch('vector_store.QdrantClient')
-    def test_add_documents_with_metadata(self, mock_client_class, mock_vs_class, mock_embedder_func):
-        """Verify add_documents works with metadata."""
-        mock_client_class.return_value = self.mock_client
-        mock_vs_class.return_value = self.mock_vs
-        mock_embedder_func.return_value = self.mock_embedder
-        self.mock_vs.add_documents.return_value = ["id1", "id2"]
-        
-        from vector_store import VectorStore
+    def test_add_documents_with_metadata(self):
+        """Verify add_documents embeds all texts in one call and uploads them in bulk."""
+        self.mock_embedder.embed_passages.return_value = np.array([[0.5, 0.25], [0.125, 1.0]])
+        
         store = VectorStore(use_memory=True)
         
         texts = ["text1", "text2"]
         metadatas = [{"source": "doc1"}, {"source": "doc2"}]
         
-        result = store.add_documents(texts, metadatas)
+        result = store.add_documents(texts, metadatas, ids=["id1", "id2"])
         
         self.assertEqual(result, ["id1", "id2"])
-        self.mock_vs.add_documents.assert_called_once()
+        self.mock_embedder.embed_passages.assert_called_once_with(texts)
+        points = self.mock_client.upload_points.call_args[1]["points"]
+        self.assertEqual([p.payload["metadata"] for p in points], metadatas)
+        self.mock_vs.add_documents.assert_not_called()
 
-    @patch('vector_store.get_embedder')
-    @patch('vector_store.QdrantVectorStore')
-    @patch('vector_store.QdrantClient')
-    def test_add_documents_without_metadata(self, mock_client_class, mock_vs_class, mock_embedder_func):
+    def test_add_documents_without_metadata(self):
         """Verify add_documents works without metadata."""
-        mock_client_class.return_value = self.mock_client
-        mock_vs_class.return_value = self.mock_vs
-        mock_embedder_func.return_value = self.mock_embedder
-        self.mock_vs.add_documents.return_value = ["id1"]
+        self.mock_embedder.embed_passages.return_value = np.array([[0.5, 0.5]])
         
-        from vector_store import VectorStore
         store = VectorStore(use_memory=True)
         
         result = store.add_documents(["text1"])
-        
+
         self.assertEqual(len(result), 1)
 
+    def test_add_with_embeddings_skips_embedder(self):
+        """Verify add_with_embeddings uploads precomputed vectors directly."""
+        store = VectorStore(use_memory=True)
+
+        result = store.add_with_embeddings(
+            ["text1", "text2"],
+            np.array([[0.5, 0.25], [0.125, 1.0]]),
+            [{"source": "doc1"}, {"source": "doc2"}]
+        )
 
-class TestVectorStoreSearch(unittest.TestCase):
+        self.assertEqual(len(result), 2)
+        points = self.mock_client.upload_points.call_args[1]["points"]
+        self.assertEqual([p.vector for p in points], [[0.5, 0.25], [0.125, 1.0]])
+        self.mock_embedder.embed_passages.assert_not_called()
+        self.mock_vs.add_documents.assert_not_called()
+
+    def test_bulk_ingest_upserts_batches(self):
+        """Verify bulk_ingest embeds and upserts per batch and only waits on the last one."""
+        self.mock_embedder.embed_passages.side_effect = lambda chunk: np.ones((len(chunk), 2))
+        store = VectorStore(use_memory=True)
+        
+        texts = ["text1", "text2", "text3"]
+        metadatas = [{"source": "doc1"}, {"source": "doc2"}, {"source": "doc3"}]
+        
+        result = store.bulk_ingest(texts, metadatas, batch_size=2)
+        
+        self.assertEqual(len(result), 3)
+        calls = self.mock_client.upsert.call_args_list
+        self.assertEqual([c.kwargs["wait"] for c in calls], [False, True])
+        self.assertEqual([c.kwargs["points"].ids for c in calls], [result[:2], result[2:]])
+        self.assertEqual(
+            [p["metadata"] for c in calls for p in c.kwargs["points"].payloads],
+            metadatas
+        )
+        self.mock_client.upload_points.assert_not_called()
+
+    def test_add_with_embeddings_uses_given_ids(self):
+        """Verify caller-supplied IDs are used as Qdrant point IDs."""
+        store = VectorStore(use_memory=True)
+
+        result = store.add_with_embeddings(["text1"], [[0.5, 0.5]], ids=[12345])
+
+        self.assertEqual(result, [12345])
+        points = self.mock_client.upload_points.call_args[1]["points"]
+        self.assertEqual(points[0].id, 12345)
+
+
+class TestVectorStoreSearch(SharedStoreTestCase):
     """Test VectorStore search method."""
 
     def setUp(self):
         """Set up test fixtures."""
-        self.mock_client = MagicMock()
-        self.mock_client.get_collections.return_value.collections = []
-        self.mock_vs = MagicMock()
-        self.mock_embedder = MagicMock()
-
-    @patch('vector_store.get_embedder')
-    @patch('vector_store.QdrantVectorStore')
-    @patch('vector_store.QdrantClient')
-    def test_search_returns_formatted_results(self, mock_client_class, mock_vs_class, mock_embedder_func):
+        super().setUp()
+        self.mock_embedder.embed_queries.side_effect = lambda queries: [[0.1, 0.2] for _ in queries]
+
+    def test_search_returns_formatted_results(self):
         """Verify search returns properly formatted results."""
-        mock_client_class.return_value = self.mock_client
-        mock_vs_class.return_value = self.mock_vs
-        mock_embedder_func.return_value = self.mock_embedder
-        
-        mock_doc = MagicMock()
-        mock_doc.page_content = "test content"
-        mock_doc.metadata = {
-            "_id": "123",
-            "source": "test.pdf",
-            "chunk_index": 0,
-            "page_number": 1
-        }
-        self.mock_vs.similarity_search_with_score.return_value = [(mock_doc, 0.95)]
-        
-        from vector_store import VectorStore
-        store = VectorStore(use_memory=True)
+        self.mock_client.query_batch_points.return_value = [make_response(
+            ("123", 0.95, "test content", {"source": "test.pdf", "chunk_index": 0, "page_number": 1})
+        )]
         
-        results = store.search("test query", top_k=5)
+        results = self.store.search("test query", top_k=5)
         
         self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["id"], "123")
         self.assertEqual(results[0]["text"], "test content")
         self.assertEqual(results[0]["score"], 0.95)
         self.assertEqual(results[0]["source"], "test.pdf")
+        self.assertEqual(results[0]["metadata"]["_id"], "123")
 
-    @patch('vector_store.get_embedder')
-    @patch('vector_store.QdrantVectorStore')
-    @patch('vector_store.QdrantClient')
-    def test_search_handles_exception(self, mock_client_class, mock_vs_class, mock_embedder_func):
-        """Verify search handles exceptions gracefully."""
-        mock_client_class.return_value = self.mock_client
-        mock_vs_class.return_value = self.mock_vs
-        mock_embedder_func.return_value = self.mock_embedder
-        self.mock_vs.similarity_search_with_score.side_effect = Exception("Search error")
-        
-        from vector_store import VectorStore
-        store = VectorStore(use_memory=True)
+    def use_server(self):
+        """Treat the shared store as a Qdrant server client for this test."""
+        self.store.is_local = False
+        self.addCleanup(setattr, self.store, "is_local", True)
+
+    def test_local_search_sends_no_search_params(self):
+        """Verify in-process searches leave out the params local Qdrant would warn about."""
+        self.mock_client.query_batch_points.return_value = [make_response()]
         
-        results = store.search("test query")
+        self.store.search("test query", top_k=5)
         
-        self.assertEqual(results, [])
+        requests = self.mock_client.query_batch_points.call_args.kwargs["requests"]
+        self.assertIsNone(requests[0].params)
 
+    def test_search_batch_single_round_trip(self):
+        """Verify search_batch embeds and queries all queries in one call each."""
+        self.use_server()
+        self.mock_client.query_batch_points.return_value = [
+            make_response(("1", 0.9, "first", {"source": "a.pdf"})),
+            make_response(("2", 0.8, "second", {"source": "b.pdf"}))
+        ]
+        
+        results = self.store.search_batch(["q1", "q2"], top_k=3)
+        
+        self.mock_embedder.embed_queries.assert_called_once_with(["q1", "q2"])
+        self.mock_client.query_batch_points.assert_called_once()
+        requests = self.mock_client.query_batch_points.call_args.kwargs["requests"]
+        self.assertEqual([r.limit for r in requests], [3, 3])
+        self.assertTrue(requests[0].params.quantization.rescore)
+        self.assertEqual(requests[0].params.hnsw_ef, 64)
+        self.assertEqual([[r["text"] for r in hits] for hits in results], [["first"], ["second"]])
 
-class TestVectorStoreStats(unittest.TestCase):
-    """Test VectorStore statistics methods."""
+    def test_search_hnsw_ef_grows_with_top_k(self):
+        """Verify large top_k searches widen the HNSW candidate list."""
+        self.use_server()
+        self.mock_client.query_batch_points.return_value = [make_response()]
+        
+        self.store.search("test query", top_k=100)
+        
+        requests = self.mock_client.query_batch_points.call_args.kwargs["requests"]
+        self.assertEqual(requests[0].params.hnsw_ef, 200)
 
-    def setUp(self):
-        """Set up test fixtures."""
-        self.mock_client = MagicMock()
-        self.mock_client.get_collections.return_value.collections = []
+    def test_search_batch_deduplicates_queries(self):
+        """Verify repeated queries in a batch are embedded and searched once."""
+        self.mock_client.query_batch_points.side_effect = lambda collection_name, requests: [
+            make_response(("1", 0.9, "text", {"source": "a.pdf"})) for _ in requests
+        ]
+        
+        results = self.store.search_batch(["q1", "q2", "q1"], top_k=3)
+        
+        self.mock_embedder.embed_queries.assert_called_once_with(["q1", "q2"])
+        self.assertEqual(len(self.mock_client.query_batch_points.call_args.kwargs["requests"]), 2)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0], results[2])
+        self.assertIsNot(results[0], results[2])
 
-    @patch('vector_store.get_embedder')
-    @patch('vector_store.QdrantVectorStore')
-    @patch('vector_store.QdrantClient')
-    def test_get_collection_stats(self, mock_client_class, mock_vs_class, mock_embedder_func):
-        """Verify get_collection_stats returns correct info."""
-        mock_client_class.return_value = self.mock_client
-        
-        mock_info = MagicMock()
-        mock_info.vectors_count = 100
-        mock_info.points_count = 100
-        mock_info.status = "green"
-        self.mock_client.get_collection.return_value = mock_info
+    def test_search_filter_source(self):
+        """Verify filter_source restricts the query and is part of the cache key."""
+        self.mock_client.query_batch_points.side_effect = lambda collection_name, requests: [
+            make_response(("1", 0.9, "text", {"source": "a.pdf"})) for _ in requests
+        ]
+        
+        self.store.search("test query", top_k=5)
+        self.store.search("test query", top_k=5, filter_source=["a.pdf"])
+        
+        self.assertEqual(self.mock_client.query_batch_points.call_count, 2)
+        request = self.mock_client.query_batch_points.call_args.kwargs["requests"][0]
+        condition = request.filter.must[0]
+        self.assertEqual(condition.key, "metadata.source")
+        self.assertEqual(condition.match.any, ["a.pdf"])
+
+    def test_search_raises_on_error(self):
+        """Verify search errors reach the caller instead of looking like an empty result."""
+        self.mock_client.query_batch_points.side_effect = Exception("Search error")
         
-        from vector_store import VectorStore
-        store = VectorStore(use_memory=True)
+        with self.assertRaises(Exception):
+            self.store.search("test query")
+        self.assertEqual(len(self.store._cache), 0)
+
+
+class TestVectorStoreStats(SharedStoreTestCase):
+    """Test VectorStore statistics methods."""
+
+    def test_get_collection_stats(self):
+        """Verify get_collection_stats returns correct info."""
+        self.mock_client.get_collection.return_value = SimpleNamespace(
+            vectors_count=100, points_count=100, status="green"
+        )
         
-        stats = store.get_collection_stats()
+        stats = self.store.get_collection_stats()
         
         self.assertEqual(stats["vectors_count"], 100)
         self.assertEqual(stats["points_count"], 100)
 
-    @patch('vector_store.get_embedder')
-    @patch('vector_store.QdrantVectorStore')
-    @patch('vector_store.QdrantClient')
-    def test_collection_exists_true(self, mock_client_class, mock_vs_class, mock_embedder_func):
+    def test_collection_exists_true(self):
         """Verify collection_exists returns True when collection has data."""
-        mock_client_class.return_value = self.mock_client
+        self.mock_client.count.return_value = SimpleNamespace(count=100)
+        
+        self.assertTrue(self.store.collection_exists())
+        self.mock_client.count.assert_called_once_with(self.store.collection_name, exact=False)
+        self.mock_client.get_collection.assert_not_called()
+
+    def test_collection_exists_false(self):
+        """Verify collection_exists returns False when collection is empty."""
+        self.mock_client.count.return_value = SimpleNamespace(count=0)
         
-        mock_info = MagicMock()
-        mock_info.vectors_count = 100
-        mock_info.points_count = 100
-        mock_info.status = "green"
-        self.mock_client.get_collection.return_value = mock_info
+        self.assertFalse(self.store.collection_exists())
+
+
+class TestVectorStoreQueryCache(VectorStoreTestCase):
+    """Test VectorStore query cache invalidation."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        super().setUp()
+        self.mock_embedder.embed_queries.side_effect = lambda queries: [[0.1, 0.2] for _ in queries]
+
+    def test_search_cached_until_documents_change(self):
+        """Verify repeated searches hit the query cache and adding documents invalidates it."""
+        self.mock_client.query_batch_points.side_effect = lambda collection_name, requests: [
+            make_response(("1", 0.9, "text", {"source": "a.pdf"})) for _ in requests
+        ]
         
-        from vector_store import VectorStore
         store = VectorStore(use_memory=True)
         
-        self.assertTrue(store.collection_exists())
+        store.search("test query", top_k=5)
+        store.search("test query", top_k=5)
+        self.assertEqual(self.mock_client.query_batch_points.call_count, 1)
+        self.assertEqual(store.get_cache_stats()["hits"], 1)
+        
+        self.mock_embedder.embed_passages.return_value = np.array([[0.1, 0.2]])
+        store.add_documents(["new text"])
+        store.search("test query", top_k=5)
+        self.assertEqual(self.mock_client.query_batch_points.call_count, 2)
 
-    @patch('vector_store.get_embedder')
-    @patch('vector_store.QdrantVectorStore')
-    @patch('vector_store.QdrantClient')
-    def test_collection_exists_false(self, mock_client_class, mock_vs_class, mock_embedder_func):
-        """Verify collection_exists returns False when collection is empty."""
-        mock_client_class.return_value = self.mock_client
+    def test_search_racing_a_write_is_not_cached(self):
+        """Verify hits read before a concurrent write are returned but not cached after it."""
+        store = VectorStore(use_memory=True)
+        
+        def search_during_write(collection_name, requests):
+            store.add_with_embeddings(["new text"], np.array([[0.1, 0.2]]))
+            return [make_response(("1", 0.9, "old", {"source": "a.pdf"}))]
         
-        mock_info = MagicMock()
-        mock_info.vectors_count = 0
-        mock_info.points_count = 0
-        mock_info.status = "green"
-        self.mock_client.get_collection.return_value = mock_info
+        self.mock_client.query_batch_points.side_effect = search_during_write
         
-        from vector_store import VectorStore
+        results = store.search("test query", top_k=5)
+        
+        self.assertEqual([r["text"] for r in results], ["old"])
+        self.assertEqual(len(store._cache), 0)
+
+    def test_writes_bump_generation(self):
+        """Verify every write advances the store's generation."""
         store = VectorStore(use_memory=True)
+        self.mock_embedder.embed_passages.side_effect = lambda texts: np.ones((len(texts), 2))
+        generations = [store.generation]
         
-        self.assertFalse(store.collection_exists())
+        store.add_documents(["text1"])
+        generations.append(store.generation)
+        store.bulk_ingest(["text2"])
+        generations.append(store.generation)
+        store.clear_collection()
+        generations.append(store.generation)
+        
+        self.assertEqual(len(set(generations)), 4)
 
 
-class TestVectorStoreClear(unittest.TestCase):
+class TestVectorStoreClear(VectorStoreTestCase):
     """Test VectorStore clear_collection method."""
 
-    @patch('vector_store.get_embedder')
-    @patch('vector_store.QdrantVectorStore')
-    @patch('vector_store.QdrantClient')
-    def test_clear_collection(self, mock_client_class, mock_vs_class, mock_embedder_func):
+    def test_clear_collection(self):
         """Verify clear_collection deletes and recreates collection."""
-        mock_client = MagicMock()
-        mock_client.get_collections.return_value.collections = []
-        mock_client_class.return_value = mock_client
-        
-        from vector_store import VectorStore
         store = VectorStore(collection_name="test", use_memory=True)
         
         store.clear_collection()
         
-        mock_client.delete_collection.assert_called_with("test")
+        self.mock_client.delete_collection.assert_called_with("test")
+        self.mock_client.create_collection.assert_called()
+        self.assertIs(store._vector_store, self.mock_vs)
+        self.mock_vs_class.assert_called_once()
 
 
 if __name__ == "__main__":
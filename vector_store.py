@@ -1,16 +1,53 @@
-from typing import List, Dict, Any, Optional
+import itertools
+import logging
+import uuid
+import threading
+from typing import List, Dict, Any, Optional, Union
+import numpy as np
 from langchain_qdrant import QdrantVectorStore
-from langchain_core.documents import Document
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, VectorParams
+from qdrant_client.http.models import (
+    Distance,
+    VectorParams,
+    PointStruct,
+    Batch,
+    PayloadSchemaType,
+    Filter,
+    FieldCondition,
+    MatchAny,
+    QueryRequest,
+    SearchParams,
+    QuantizationSearchParams,
+    Datatype,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType
+)
 
 from config import (
     QDRANT_PATH, 
     COLLECTION_NAME, 
     EMBEDDING_DIMENSION,
-    USE_MEMORY_MODE
+    USE_MEMORY_MODE,
+    VECTOR_DATATYPE,
+    VECTOR_INT8_QUANTIZATION,
+    VECTOR_QUANTIZATION_OVERSAMPLING,
+    HNSW_EF_MIN,
+    QDRANT_UPLOAD_BATCH_SIZE,
+    QDRANT_UPLOAD_PARALLEL
 )
 from embeddings import get_embedder
+from query_cache import QueryCache
+
+logger = logging.getLogger(__name__)
+
+
+# Metadata fields that search filters on; payloads nest them under the wrapper's metadata key.
+# Only a Qdrant server uses payload indexes, local mode always scans
+_INDEXED_FIELDS = {
+    f"{QdrantVectorStore.METADATA_KEY}.source": PayloadSchemaType.KEYWORD,
+    f"{QdrantVectorStore.METADATA_KEY}.page_number": PayloadSchemaType.INTEGER
+}
 
 
 class VectorStore:
@@ -24,13 +61,28 @@ class VectorStore:
         self.collection_name = collection_name
         self.use_memory = use_memory
         self.path = path
+        # Search results keyed on (query, top_k, sources, collection); dropped whenever documents change
+        self._cache = QueryCache()
+        # Bumped on every write so caches built on top of search results can tell they are stale
+        self._generations = itertools.count(1)
+        self.generation = 0
+        # Search the INT8 copy for oversampled candidates, then rescore them at stored precision
+        self._quantization_params = None
+        if VECTOR_INT8_QUANTIZATION:
+            self._quantization_params = QuantizationSearchParams(
+                rescore=True,
+                oversampling=VECTOR_QUANTIZATION_OVERSAMPLING
+            )
         
         if use_memory:
-            print("Initializing Qdrant: Memory mode (temporary)")
+            logger.info("Initializing Qdrant: Memory mode (temporary)")
             self._client = QdrantClient(":memory:")
         else:
-            print(f"Initializing Qdrant: Disk mode ({path})")
+            logger.info("Initializing Qdrant: Disk mode (%s)", path)
             self._client = QdrantClient(path=path)
+        # Both modes run Qdrant in-process, which searches exhaustively and ignores
+        # search params and payload indexes (warning when they are passed)
+        self.is_local = True
         
         self._ensure_collection_exists()
 
@@ -42,75 +94,250 @@ class VectorStore:
             embedding=self._embedder
         )
         
-        print(f"Collection ready: {collection_name}")
+        logger.info("Collection ready: %s", collection_name)
     
     def _ensure_collection_exists(self):
         try:
-            collections = self._client.get_collections().collections
-            collection_names = [c.name for c in collections]
-            
-            if self.collection_name not in collection_names:
-                print(f"Creating new collection: {self.collection_name}")
+            if not self._client.collection_exists(self.collection_name):
+                logger.info("Creating new collection: %s", self.collection_name)
+                quantization_config = None
+                if VECTOR_INT8_QUANTIZATION:
+                    quantization_config = ScalarQuantization(
+                        scalar=ScalarQuantizationConfig(
+                            type=ScalarType.INT8,
+                            always_ram=True
+                        )
+                    )
+                
                 self._client.create_collection(
                     collection_name=self.collection_name,
                     vectors_config=VectorParams(
                         size=EMBEDDING_DIMENSION,
-                        distance=Distance.COSINE
-                    )
+                        distance=Distance.COSINE,
+                        datatype=Datatype(VECTOR_DATATYPE)
+                    ),
+                    quantization_config=quantization_config
                 )
-        except Exception as e:
-            print(f"Koleksiyon kontrolü hatası: {e}")
+            self._ensure_payload_indexes()
+        except Exception:
+            logger.exception("Koleksiyon kontrolü hatası")
             raise
     
+    def _ensure_payload_indexes(self):
+        if self.is_local:
+            return
+        # Collections created before the indexes existed get them too; present ones are left alone
+        existing = self._client.get_collection(self.collection_name).payload_schema or {}
+        for field, schema in _INDEXED_FIELDS.items():
+            if field not in existing:
+                self._client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field,
+                    field_schema=schema
+                )
+    
     def add_documents(
         self, 
         texts: List[str], 
-        metadatas: Optional[List[Dict[str, Any]]] = None
-    ) -> List[str]:
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[Union[int, str]]] = None
+    ) -> List[Union[int, str]]:
+        if not texts:
+            return []
+        # One batched encode for all texts instead of the langchain wrapper's per-document path
+        embeddings = self._embedder.embed_passages(texts)
+        return self.add_with_embeddings(texts, embeddings, metadatas, ids)
+    
+    def add_with_embeddings(
+        self,
+        texts: List[str],
+        embeddings: Union[np.ndarray, List[List[float]]],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[Union[int, str]]] = None
+    ) -> List[Union[int, str]]:
         
         if metadatas is None:
             metadatas = [{} for _ in texts]
         
-        documents = [
-            Document(page_content=text, metadata=meta)
-            for text, meta in zip(texts, metadatas)
+        # Caller-supplied deterministic IDs make re-ingest an in-place overwrite
+        if ids is None:
+            ids = [uuid.uuid4().hex for _ in texts]
+        vectors = np.asarray(embeddings, dtype=np.float32).tolist()
+        
+        # Same payload layout as the langchain wrapper so search() reads these points too;
+        # keys are looked up once rather than through the wrapper for every chunk
+        content_key = self._vector_store.content_payload_key
+        metadata_key = self._vector_store.metadata_payload_key
+        points = [
+            PointStruct(
+                id=point_id,
+                vector=vector,
+                payload={content_key: text, metadata_key: meta}
+            )
+            for point_id, text, vector, meta in zip(ids, texts, vectors, metadatas)
         ]
         
         try:
-            ids = self._vector_store.add_documents(documents)
-            print(f"{len(documents)} documents added")
+            self._client.upload_points(
+                collection_name=self.collection_name,
+                points=points,
+                batch_size=QDRANT_UPLOAD_BATCH_SIZE,
+                parallel=QDRANT_UPLOAD_PARALLEL,
+                wait=True
+            )
+            self._documents_changed()
+            logger.info("%d documents added", len(points))
             return ids
-        except Exception as e:
-            print(f"Document add error: {e}")
+        except Exception:
+            logger.exception("Document add error")
+            raise
+    
+    def bulk_ingest(
+        self,
+        texts: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        batch_size: int = QDRANT_UPLOAD_BATCH_SIZE
+    ) -> List[str]:
+        if metadatas is None:
+            metadatas = [{} for _ in texts]
+        
+        content_key = self._vector_store.content_payload_key
+        metadata_key = self._vector_store.metadata_payload_key
+        all_ids = []
+        try:
+            for start in range(0, len(texts), batch_size):
+                chunk = texts[start:start + batch_size]
+                ids = [uuid.uuid4().hex for _ in chunk]
+                vectors = np.asarray(self._embedder.embed_passages(chunk), dtype=np.float32).tolist()
+                # Columnar batch instead of one PointStruct per chunk; only the last upsert waits,
+                # so Qdrant indexes batch N while batch N + 1 is being embedded
+                self._client.upsert(
+                    collection_name=self.collection_name,
+                    points=Batch(
+                        ids=ids,
+                        vectors=vectors,
+                        payloads=[
+                            {content_key: text, metadata_key: meta}
+                            for text, meta in zip(chunk, metadatas[start:start + batch_size])
+                        ]
+                    ),
+                    wait=start + batch_size >= len(texts)
+                )
+                all_ids.extend(ids)
+        except Exception:
+            logger.exception("Bulk ingest error")
             raise
+        finally:
+            if all_ids:
+                self._documents_changed()
+        
+        logger.info("%d documents ingested", len(all_ids))
+        return all_ids
+    
+    def _documents_changed(self):
+        self._cache.invalidate()
+        self.generation = next(self._generations)
+    
+    def _format_hits(self, points) -> List[Dict[str, Any]]:
+        content_key = self._vector_store.content_payload_key
+        metadata_key = self._vector_store.metadata_payload_key
+        collection_name = self.collection_name
+        # Payload and metadata are bound once per hit; metadata matches what the langchain wrapper attaches
+        return [
+            {
+                "id": point.id,
+                "score": point.score,
+                "text": (payload := point.payload or {}).get(content_key, ""),
+                "source": (m := {
+                    **(payload.get(metadata_key) or {}),
+                    "_id": point.id,
+                    "_collection_name": collection_name
+                }).get("source", "Unknown"),
+                "chunk_index": m.get("chunk_index", -1),
+                "page_number": m.get("page_number", -1),
+                "metadata": m
+            }
+            for point in points
+        ]
     
     def search(
         self, 
         query: str, 
-        top_k: int = 20
+        top_k: int = 20,
+        filter_source: Optional[List[str]] = None
     ) -> List[Dict[str, Any]]:
+        return self.search_batch([query], top_k=top_k, filter_source=filter_source)[0]
+    
+    def search_batch(
+        self,
+        queries: List[str],
+        top_k: int = 20,
+        filter_source: Optional[List[str]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        if not queries:
+            return []
+        
+        sources = tuple(sorted(set(filter_source))) if filter_source else None
+        query_filter = None
+        if sources:
+            query_filter = Filter(must=[FieldCondition(
+                key=f"{self._vector_store.metadata_payload_key}.source",
+                match=MatchAny(any=list(sources))
+            )])
+        
+        results = []
+        # Uncached query text -> positions waiting for it, so duplicates are searched once
+        misses: Dict[str, List[int]] = {}
+        for i, query in enumerate(queries):
+            cached = self._cache.get((query, top_k, sources, self.collection_name))
+            # Copies so callers cannot mutate the cached list
+            results.append(None if cached is None else list(cached))
+            if cached is None:
+                misses.setdefault(query, []).append(i)
+        if not misses:
+            return results
+        
+        unique_queries = list(misses)
+        # A write during the search clears the cache; hits read before it must not be put back
+        generation = self.generation
         try:
-            results = self._vector_store.similarity_search_with_score(
-                query=query,
-                k=top_k
+            # One embedding call and one Qdrant round-trip for all uncached queries
+            vectors = self._embedder.embed_queries(unique_queries)
+            # Scale the HNSW candidate list with top_k instead of using the collection default
+            params = None
+            if not self.is_local:
+                params = SearchParams(
+                    hnsw_ef=max(HNSW_EF_MIN, 2 * top_k),
+                    quantization=self._quantization_params
+                )
+            requests = [
+                QueryRequest(
+                    query=vector,
+                    limit=top_k,
+                    filter=query_filter,
+                    params=params,
+                    with_payload=True
+                )
+                for vector in vectors
+            ]
+            responses = self._client.query_batch_points(
+                collection_name=self.collection_name,
+                requests=requests
             )
-            
-            formatted_results = []
-            for doc, score in results:
-                formatted_results.append({
-                    "id": doc.metadata.get("_id", ""),
-                    "score": score,
-                    "text": doc.page_content,
-                    "source": doc.metadata.get("source", "Unknown"),
-                    "chunk_index": doc.metadata.get("chunk_index", -1),
-                    "page_number": doc.metadata.get("page_number", -1),
-                    "metadata": doc.metadata
-                })
-            
-            return formatted_results
-        except Exception as e:
-            print(f"Search error: {e}")
-            return []
+        except Exception:
+            logger.exception("Search error")
+            raise
+        
+        for query, response in zip(unique_queries, responses):
+            hits = self._format_hits(response.points)
+            if self.generation == generation:
+                self._cache.put((query, top_k, sources, self.collection_name), hits)
+            for i in misses[query]:
+                results[i] = list(hits)
+        return results
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
     
     def get_collection_stats(self) -> Dict[str, Any]:
         try:
@@ -121,8 +348,8 @@ class VectorStore:
                 "points_count": info.points_count,
                 "status": info.status
             }
-        except Exception as e:
-            print(f"Stats retrieval error: {e}")
+        except Exception:
+            logger.exception("Stats retrieval error")
             return {
                 "name": self.collection_name,
                 "vectors_count": 0,
@@ -132,36 +359,41 @@ class VectorStore:
     
     def clear_collection(self):
         try:
-            print(f"Deleting collection: {self.collection_name}")
+            logger.info("Deleting collection: %s", self.collection_name)
             self._client.delete_collection(self.collection_name)
+            self._documents_changed()
+            # The langchain wrapper only holds the client and collection name, so it stays valid
             self._ensure_collection_exists()
-            
-            self._vector_store = QdrantVectorStore(
-                client=self._client,
-                collection_name=self.collection_name,
-                embedding=self._embedder
-            )
-            print("Collection reset")
-        except Exception as e:
-            print(f"Collection delete error: {e}")
+            logger.info("Collection reset")
+        except Exception:
+            logger.exception("Collection delete error")
             raise
     
     def collection_exists(self) -> bool:
-        stats = self.get_collection_stats()
-        return stats["points_count"] > 0
+        # An approximate count is enough to tell empty from non-empty, without fetching collection info
+        try:
+            return self._client.count(self.collection_name, exact=False).count > 0
+        except Exception:
+            logger.exception("Count error")
+            return False
 
 
 _vector_store_instance = None
+_vector_store_lock = threading.Lock()
 
 
 def get_vector_store() -> VectorStore:
     global _vector_store_instance
+    # Double-checked so concurrent first calls cannot build two instances
     if _vector_store_instance is None:
-        _vector_store_instance = VectorStore()
+        with _vector_store_lock:
+            if _vector_store_instance is None:
+                _vector_store_instance = VectorStore()
     return _vector_store_instance
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     store = VectorStore(use_memory=True)
     
     texts = [
@@ -175,7 +407,7 @@ if __name__ == "__main__":
         {"source": "amortisman_tablosu.pdf", "page_number": 3}
     ]
     
-    ids = store.add_documents(texts, metadatas)
+    ids = store.bulk_ingest(texts, metadatas)
     print(f"Eklenen ID'ler: {ids}")
 
     results = store.search("KDV oranı nedir?", top_k=2)